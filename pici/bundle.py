@@ -0,0 +1,200 @@
+"""
+On-disk bundles of preprocessed communities.
+
+Preprocessing (text cleaning, sentiment, topic models, text statistics) can
+take hours for large communities. A bundle stores the preprocessed state of
+a ``Community`` so it can be restored in seconds:
+
+- ``manifest.json``: bundle format version, community class and name, date
+  window, the cache snapshot the community was loaded from (``source``) and
+  the preprocessing parameters (and their hash)
+- ``posts.pkl``, ``contributors.pkl``, ``topics.pkl``: the community's
+  tables, including all preprocessed columns
+- ``state.pkl``: community attributes and identifier categories
+- ``graphs.pkl``: co-contributor, commenter and cached temporal graphs that
+  were built
+
+Frames are pickled, as preprocessed columns contain python objects (tuples
+of words, topic distributions) that columnar formats do not store.
+
+A bundle is stale if it was written by another bundle format version, from
+another cache snapshot or with other preprocessing parameters than the
+ones it is checked against (see ``check_bundle``).
+"""
+import datetime
+import hashlib
+import importlib
+import json
+import os
+import pickle
+
+import pandas as pd
+
+from pici import __version__
+
+BUNDLE_VERSION = 1
+
+BUNDLE_TABLES = ['posts', 'contributors', 'topics']
+
+
+def parameters_hash(parameters):
+    """
+    SHA-256 hash of the JSON representation of ``parameters``.
+    """
+    dump = json.dumps(parameters, sort_keys=True, default=str)
+
+    return f'sha256:{hashlib.sha256(dump.encode()).hexdigest()}'
+
+
+def class_path(cls):
+    """
+    ``module:qualname`` of ``cls`` (see ``import_class``).
+    """
+    return f'{cls.__module__}:{cls.__qualname__}'
+
+
+def import_class(path):
+    """
+    Import a class from its ``module:qualname`` path.
+    """
+    module, qualname = path.split(':')
+    cls = importlib.import_module(module)
+    for attr in qualname.split('.'):
+        cls = getattr(cls, attr)
+
+    return cls
+
+
+def _json_window(window):
+    return [None if d is None else pd.Timestamp(d).isoformat()
+            for d in window]
+
+
+def read_bundle_manifest(path):
+    """
+    The manifest of the bundle at ``path`` (None if there is no bundle).
+    """
+    fn = f'{path}/manifest.json'
+    if not os.path.exists(fn):
+        return None
+    with open(fn) as f:
+        return json.load(f)
+
+
+def check_bundle(path, source=None, parameters=None, window=None):
+    """
+    Check whether the bundle at ``path`` is current.
+
+    Args:
+        path: Bundle directory.
+        source: Cache snapshot the bundle has to be created from (see
+            ``CommunityFactory.cache_source``, None: do not check).
+        parameters: Preprocessing parameters the bundle has to be created
+            with (None: do not check).
+        window: (start, end) date window of the community (None: do not
+            check).
+
+    Returns: list of problems (empty if the bundle is current).
+    """
+    manifest = read_bundle_manifest(path)
+    if manifest is None:
+        return [f"No bundle found at {path}."]
+
+    problems = []
+    if manifest.get('version') != BUNDLE_VERSION:
+        problems.append(f"Bundle version {manifest.get('version')} is not "
+                        f"{BUNDLE_VERSION}.")
+    if source is not None and manifest.get('source') != json.loads(
+            json.dumps(source, default=str)):
+        problems.append(f"Bundle was created from {manifest.get('source')}, "
+                        f"not from {source}.")
+    if parameters is not None and \
+            manifest.get('parameters_hash') != parameters_hash(parameters):
+        problems.append("Bundle was created with other preprocessing "
+                        "parameters.")
+    if window is not None and manifest.get('window') != _json_window(window):
+        problems.append(f"Bundle has window {manifest.get('window')}, not "
+                        f"{_json_window(window)}.")
+
+    return problems
+
+
+def save_bundle(community, path, parameters=None):
+    """
+    Save a (preprocessed) community as bundle in directory ``path``. The
+    manifest is written last, so an interrupted save leaves no valid
+    bundle.
+
+    Args:
+        community: pici.Community
+        path: Bundle directory (created if it does not exist).
+        parameters: Preprocessing parameters used (JSON-serializable).
+
+    Returns: path
+    """
+    os.makedirs(path, exist_ok=True)
+    fn = f'{path}/manifest.json'
+    if os.path.exists(fn):
+        os.remove(fn)
+
+    for table in BUNDLE_TABLES:
+        getattr(community, table).to_pickle(f'{path}/{table}.pkl')
+    with open(f'{path}/state.pkl', 'wb') as f:
+        pickle.dump(community._get_state(), f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    with open(f'{path}/graphs.pkl', 'wb') as f:
+        pickle.dump(community._get_bundle_graphs(), f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+
+    manifest = {
+        'version': BUNDLE_VERSION,
+        'pici_version': __version__,
+        'created': datetime.datetime.now().isoformat(),
+        'class': class_path(type(community)),
+        'name': community.name,
+        'window': _json_window(community.window),
+        'source': community.source,
+        'parameters': parameters,
+        'parameters_hash': parameters_hash(parameters),
+        'tables': {
+            table: len(getattr(community, table))
+            for table in BUNDLE_TABLES
+        }
+    }
+    tmp = f'{fn}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1, default=str)
+    os.replace(tmp, fn)
+
+    return path
+
+
+def load_bundle(path, source=None, parameters=None, window=None):
+    """
+    Restore a community from the bundle at ``path``.
+
+    Args:
+        path: Bundle directory.
+        source, parameters, window: see ``check_bundle``.
+
+    Raises:
+        ValueError: if the bundle is missing or stale.
+
+    Returns: pici.Community
+    """
+    problems = check_bundle(path, source, parameters, window)
+    if problems:
+        raise ValueError(f"Can not load bundle {path}: " + " ".join(problems))
+
+    manifest = read_bundle_manifest(path)
+    tables = {
+        table: pd.read_pickle(f'{path}/{table}.pkl')
+        for table in BUNDLE_TABLES
+    }
+    with open(f'{path}/state.pkl', 'rb') as f:
+        state = pickle.load(f)
+    with open(f'{path}/graphs.pkl', 'rb') as f:
+        graphs = pickle.load(f)
+
+    return import_class(manifest['class'])._from_bundle(manifest, tables,
+                                                        state, graphs)
@@ -0,0 +1,641 @@
+"""
+Storage backends for the community data cache.
+
+Community factories write the (scraped) tables of a community to a cache
+directory, one file per table and snapshot, named
+``{community}_{table}_{date}.{extension}``. The file format is determined by
+a ``CacheBackend``:
+
+- ``csv``: plain text, readable by any tool, but all types have to be
+  re-inferred (and dates re-parsed) on every load.
+- ``parquet``: typed, columnar storage (requires ``pyarrow``). Datetimes,
+  categoricals and integer ids are preserved. This is the default whenever
+  ``pyarrow`` is installed.
+
+Backends are interchangeable: a factory reads every snapshot with the
+backend matching the file's extension and writes new snapshots using its
+configured backend.
+
+Tables with date columns are stored sorted by their first date column. A
+date window (``start``, ``end``) passed to ``CacheBackend.read`` is pushed
+down into the read: the parquet backend only decodes row groups whose
+date statistics overlap the window, the CSV backend filters chunk by chunk,
+so memory scales with the window instead of the full history.
+
+Each community keeps a ``CacheManifest`` (``{community}_manifest.json``)
+that lists its snapshots with their tables, row counts, schemas and
+checksums. The most recent complete snapshot is looked up from the
+manifest, without scanning the cache directory.
+
+Snapshots are either full (base) snapshots or delta snapshots that only
+contain content scraped after the previous snapshot's high-water mark.
+Delta tables are stored as ``{community}_{table}-delta_{date}.{extension}``
+and are merged into their base snapshot when the cache is loaded.
+"""
+import datetime
+import glob
+import hashlib
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """
+    Abstract cache backend. Reads and writes single tables of a community.
+    """
+
+    @property
+    @abstractmethod
+    def name(self):
+        raise NotImplementedError("Property not set")
+
+    @property
+    @abstractmethod
+    def extension(self):
+        raise NotImplementedError("Property not set")
+
+    def path(self, cache_dir, community, table, date):
+        """
+        Path of the cache file of ``table`` for snapshot ``date``.
+        """
+        return f'{cache_dir}/{community}_{table}_{date}.{self.extension}'
+
+    @abstractmethod
+    def read(self, path, nrows=None, date_column=None, start=None, end=None,
+             columns=None):
+        pass
+
+    @abstractmethod
+    def write(self, df, path):
+        pass
+
+
+def window_bound(value, dtype):
+    """
+    Convert a window bound to a ``pandas.Timestamp`` that is comparable to
+    values of ``dtype`` (naive bounds are localized to the column's
+    timezone).
+    """
+    if value is None:
+        return None
+    ts = pd.Timestamp(value)
+    tz = getattr(dtype, 'tz', None)
+    if tz is not None and ts.tzinfo is None:
+        ts = ts.tz_localize(tz)
+    elif tz is None and ts.tzinfo is not None:
+        ts = ts.tz_convert(None)
+
+    return ts
+
+
+def _projection(columns, date_column=None):
+    """
+    Columns to read: ``columns`` plus the column used for date filtering.
+    """
+    if columns is None:
+        return None
+    columns = list(columns)
+    if date_column is not None and date_column not in columns:
+        columns.append(date_column)
+
+    return columns
+
+
+def filter_window(df, date_column, start=None, end=None):
+    """
+    Select rows of ``df`` with ``start <= date_column < end``. The column is
+    parsed as datetime if necessary.
+    """
+    if date_column is None or (start is None and end is None):
+        return df
+    dates = df[date_column]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors='coerce')
+        df = df.assign(**{date_column: dates})
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= dates >= window_bound(start, dates.dtype)
+    if end is not None:
+        mask &= dates < window_bound(end, dates.dtype)
+
+    return df[mask]
+
+
+def prepare_table(df, date_columns=None):
+    """
+    Prepare a table for caching: parse ``date_columns`` as datetimes and
+    sort rows by the first of them (enables date window pushdown).
+    """
+    if not date_columns:
+        return df
+    for col in date_columns:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    if date_columns[0] in df.columns:
+        df = df.sort_values(by=date_columns[0], kind='stable')
+
+    return df
+
+
+class CSVCacheBackend(CacheBackend):
+    """
+    Stores tables as CSV files (the original cache format).
+    """
+
+    name = 'csv'
+    extension = 'csv'
+    chunksize = 100000
+
+    def read(self, path, nrows=None, date_column=None, start=None, end=None,
+             columns=None):
+        columns = _projection(columns, date_column)
+        usecols = None if columns is None else lambda c: c in columns
+        if date_column is None or (start is None and end is None):
+            return pd.read_csv(path, nrows=nrows, usecols=usecols)
+
+        chunks = [
+            filter_window(chunk, date_column, start, end)
+            for chunk in pd.read_csv(path, nrows=nrows, usecols=usecols,
+                                     chunksize=self.chunksize)
+        ]
+        if len(chunks) == 0:
+            # no rows (e.g., only a header): keep the file's columns
+            return pd.read_csv(path, nrows=0, usecols=usecols)
+
+        return pd.concat(chunks)
+
+    def write(self, df, path):
+        df.to_csv(path)
+
+
+class ParquetCacheBackend(CacheBackend):
+    """
+    Stores tables as Parquet files using ``pyarrow``. Column types
+    (datetimes incl. timezones, categoricals, nullable integers) survive the
+    round trip, so no parsing is necessary when loading.
+    """
+
+    name = 'parquet'
+    extension = 'parquet'
+    row_group_size = 50000
+
+    def __init__(self):
+        if pq is None:
+            raise ImportError("The parquet cache backend requires pyarrow.")
+
+    def _window_filters(self, path, date_column, start, end):
+        field = pq.read_schema(path).field(date_column)
+        if not pa.types.is_timestamp(field.type):
+            return None
+        dtype = pd.DatetimeTZDtype(tz=field.type.tz) if field.type.tz \
+            else None
+        filters = []
+        if start is not None:
+            filters.append((date_column, '>=', window_bound(start, dtype)))
+        if end is not None:
+            filters.append((date_column, '<', window_bound(end, dtype)))
+
+        return filters
+
+    @staticmethod
+    def _available(schema, columns):
+        """
+        Restrict ``columns`` to those in ``schema`` (plus stored index
+        columns).
+        """
+        if columns is None:
+            return None
+        index_columns = [
+            c for c in (schema.pandas_metadata or {}).get('index_columns', [])
+            if isinstance(c, str)
+        ]
+        return [c for c in schema.names
+                if c in columns or c in index_columns]
+
+    def read(self, path, nrows=None, date_column=None, start=None, end=None,
+             columns=None):
+        schema = pq.read_schema(path)
+        columns = self._available(schema, _projection(columns, date_column))
+        if nrows is None:
+            filters = None
+            if date_column is not None and (start is not None
+                                            or end is not None):
+                filters = self._window_filters(path, date_column, start, end)
+            df = pq.read_table(path, columns=columns,
+                               filters=filters).to_pandas()
+
+            # column is not typed: filter after loading
+            if filters is None:
+                df = filter_window(df, date_column, start, end)
+
+            return df
+
+        # only decode the batches that contain the first rows (batches end
+        # at row group boundaries)
+        pf = pq.ParquetFile(path)
+        batches = []
+        remaining = nrows
+        for batch in pf.iter_batches(batch_size=nrows, columns=columns):
+            if remaining <= 0:
+                break
+            batches.append(batch.slice(0, remaining))
+            remaining -= batches[-1].num_rows
+        if len(batches) == 0:
+            table = pf.schema_arrow.empty_table()
+            if columns is not None:
+                table = table.select(columns)
+        else:
+            table = pa.Table.from_batches(batches).replace_schema_metadata(
+                pf.schema_arrow.metadata)
+
+        return filter_window(table.to_pandas(), date_column, start, end)
+
+    def write(self, df, path):
+        df.to_parquet(path, engine='pyarrow',
+                      row_group_size=self.row_group_size)
+
+
+CACHE_BACKENDS = {
+    'csv': CSVCacheBackend,
+    'parquet': ParquetCacheBackend
+}
+
+
+def default_cache_format():
+    """
+    The default cache format: ``parquet`` if ``pyarrow`` is available,
+    ``csv`` otherwise.
+    """
+    return 'parquet' if pq is not None else 'csv'
+
+
+def get_cache_backend(cache_format=None):
+    """
+    Get a cache backend instance by its name.
+
+    Args:
+        cache_format (str): One of ``CACHE_BACKENDS`` (None: use
+            ``default_cache_format()``).
+
+    Returns: CacheBackend
+
+    """
+    if cache_format is None:
+        cache_format = default_cache_format()
+    try:
+        return CACHE_BACKENDS[cache_format]()
+    except KeyError:
+        raise ValueError(f"Unknown cache format '{cache_format}'. Valid "
+                         f"formats: {', '.join(CACHE_BACKENDS.keys())}")
+
+
+def backend_for_path(path):
+    """
+    Get the cache backend that can read the file at ``path`` (determined by
+    file extension).
+    """
+    extension = os.path.splitext(path)[1][1:]
+    for name, backend in CACHE_BACKENDS.items():
+        if backend.extension == extension:
+            return get_cache_backend(name)
+
+    raise ValueError(f"No cache backend for file '{path}'.")
+
+
+def snapshot_date(path):
+    """
+    Extract the snapshot date (string) from a cache file name.
+    """
+    return os.path.basename(path).split("_")[-1].split(".")[0]
+
+
+def find_cache_files(cache_dir, community, table, prefer=None):
+    """
+    Find all cache files of ``table``, in any of the known formats.
+
+    Args:
+        cache_dir: Cache directory.
+        community: Name of the community (factory).
+        table: Name of the table.
+        prefer: Name of the cache format to use if a snapshot exists in
+            several formats.
+
+    Returns: dict of snapshot date (str): path
+
+    """
+    files = {}
+    for name, backend in CACHE_BACKENDS.items():
+        pattern = f'{cache_dir}/{community}_{table}_*.{backend.extension}'
+        for fn in glob.glob(pattern):
+            date = snapshot_date(fn)
+            if date not in files or name == prefer:
+                files[date] = fn
+
+    return files
+
+
+def file_checksum(path, chunksize=1 << 20):
+    """
+    SHA-256 checksum of the file at ``path``.
+    """
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunksize), b''):
+            h.update(chunk)
+
+    return f'sha256:{h.hexdigest()}'
+
+
+class CacheManifest:
+    """
+    Index of the cache snapshots of one community, stored as JSON in
+    ``{cache_dir}/{community}_manifest.json``.
+
+    For every snapshot (identified by its date string), the manifest lists
+    the cached tables with file name, format, number of rows, schema
+    (column: dtype) and checksum, the snapshot's ``base`` (None for full
+    snapshots, the date of the base snapshot for deltas) and its
+    ``high_water_mark``. The manifest also keeps a pointer to the most
+    recent full snapshot that contains all ``tables``.
+    """
+
+    delta_suffix = '-delta'
+
+    version = 1
+
+    def __init__(self, cache_dir, community, tables,
+                 date_format='%Y-%m-%d-%H-%M-%S'):
+        self.cache_dir = cache_dir
+        self.community = community
+        self.tables = list(tables)
+        self.date_format = date_format
+        self.path = f'{cache_dir}/{community}_manifest.json'
+        self._snapshots = None
+        self._latest = None
+
+    @property
+    def exists(self):
+        return os.path.exists(self.path)
+
+    @property
+    def snapshots(self):
+        if self._snapshots is None:
+            self.load()
+
+        return self._snapshots
+
+    @property
+    def latest(self):
+        """
+        Date of the most recent complete snapshot (None if there is none).
+        """
+        if self._snapshots is None:
+            self.load()
+
+        return self._latest
+
+    def load(self):
+        self._snapshots = {}
+        self._latest = None
+        if self.exists:
+            with open(self.path) as f:
+                m = json.load(f)
+            self._snapshots = m.get('snapshots', {})
+            self._latest = m.get('latest')
+
+        return self
+
+    def save(self):
+        manifest = {
+            'version': self.version,
+            'community': self.community,
+            'tables': self.tables,
+            'latest': self.latest,
+            'snapshots': self.snapshots
+        }
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=1, default=str)
+        os.replace(tmp, self.path)
+
+    def _parse_date(self, date):
+        return datetime.datetime.strptime(date, self.date_format)
+
+    def _is_complete(self, date):
+        return all(t in self.snapshots[date]['tables'] for t in self.tables)
+
+    def _update_latest(self):
+        complete = [d for d in self.snapshots
+                    if self.snapshots[d].get('base') is None
+                    and self._is_complete(d)]
+        self._latest = max(complete, key=self._parse_date, default=None)
+
+    def deltas(self, base=None):
+        """
+        Dates of the delta snapshots of ``base`` (default: latest), oldest
+        first.
+        """
+        base = self.latest if base is None else base
+        return sorted(
+            [d for d, snapshot in self.snapshots.items()
+             if snapshot.get('base') == base and base is not None],
+            key=self._parse_date
+        )
+
+    @property
+    def high_water_mark(self):
+        """
+        High-water mark of the most recent snapshot (base or delta) of the
+        latest base snapshot. Defaults to the snapshot's date if no
+        high-water mark was recorded (None if there is no snapshot).
+        """
+        if self.latest is None:
+            return None
+        last = ([self.latest] + self.deltas())[-1]
+
+        return self.snapshots[last].get('high_water_mark') or \
+            self._parse_date(last).isoformat()
+
+    def set_high_water_mark(self, date, value):
+        self.snapshots.setdefault(date, {'tables': {}})[
+            'high_water_mark'] = value
+
+    def add(self, date, table, path, df=None, checksum=True, base=None):
+        """
+        Register the cache file ``path`` as ``table`` of snapshot ``date``.
+
+        Args:
+            date: Snapshot date (str).
+            table: Table name.
+            path: Path of the cache file.
+            df: The cached data (used for row count and schema). If None,
+                the file is read.
+            checksum: Whether to compute the file's checksum.
+            base: Date of the base snapshot if ``date`` is a delta snapshot.
+
+        Raises:
+            ValueError: if ``date`` is its own base.
+        """
+        if base is not None and base == date:
+            raise ValueError(f"Delta snapshot {date} can not have itself as "
+                             f"base.")
+        if df is None:
+            df = backend_for_path(path).read(path)
+        entry = {
+            'file': os.path.basename(path),
+            'format': backend_for_path(path).name,
+            'rows': int(len(df.index)),
+            'schema': {str(c): str(t) for c, t in df.dtypes.items()},
+            'checksum': file_checksum(path) if checksum else None
+        }
+        snapshot = self.snapshots.setdefault(date, {'tables': {}})
+        snapshot['tables'][table] = entry
+        snapshot['base'] = base
+        self._update_latest()
+
+        return entry
+
+    def files(self, date=None):
+        """
+        Paths of the cached tables of snapshot ``date`` (default: latest).
+
+        Returns: dict of table: path
+        """
+        date = self.latest if date is None else date
+        if date is None or date not in self.snapshots:
+            return {}
+
+        return {
+            t: f"{self.cache_dir}/{e['file']}"
+            for t, e in self.snapshots[date]['tables'].items()
+        }
+
+    def verify(self, date=None, checksums=False):
+        """
+        Check that snapshot ``date`` (default: latest) is complete and its
+        files exist (and match their checksums).
+
+        Returns: list of problems (empty if the snapshot is valid).
+        """
+        date = self.latest if date is None else date
+        if date is None or date not in self.snapshots:
+            return [f"No snapshot {date} in manifest."]
+
+        problems = [f"Table {t} missing in snapshot {date}."
+                    for t in self.tables
+                    if t not in self.snapshots[date]['tables']]
+        for d in [date] + self.deltas(date):
+            for t, path in self.files(d).items():
+                if not os.path.exists(path):
+                    problems.append(f"File {path} does not exist.")
+                elif checksums:
+                    expected = self.snapshots[d]['tables'][t]['checksum']
+                    if expected is not None and \
+                            file_checksum(path) != expected:
+                        problems.append(f"Checksum of {path} does not "
+                                        f"match.")
+
+        return problems
+
+    def rebuild(self, prefer=None, checksum=True):
+        """
+        Re-create the manifest by scanning the cache directory.
+        """
+        self._snapshots = {}
+        self._latest = None
+        for table in self.tables:
+            files = find_cache_files(self.cache_dir, self.community, table,
+                                     prefer=prefer)
+            for date, path in files.items():
+                self.add(date, table, path, checksum=checksum)
+
+        # assign deltas to the most recent preceding full snapshot
+        bases = sorted([d for d in self.snapshots if self._is_complete(d)],
+                       key=self._parse_date)
+        for table in self.tables:
+            files = find_cache_files(self.cache_dir, self.community,
+                                     f'{table}{self.delta_suffix}',
+                                     prefer=prefer)
+            for date, path in files.items():
+                preceding = [b for b in bases
+                             if self._parse_date(b) <= self._parse_date(date)]
+                if preceding:
+                    self.add(date, table, path, checksum=checksum,
+                             base=preceding[-1])
+
+        return self
+
+
+def migrate_cache(cache_dir, community, tables, cache_format=None,
+                  date_columns=None, remove_source=False,
+                  date_format='%Y-%m-%d-%H-%M-%S', convert=None):
+    """
+    Convert all CSV snapshots of a community to another cache format and
+    write the community's cache manifest for the migrated files.
+
+    Args:
+        cache_dir: Cache directory.
+        community: Name of the community (factory).
+        tables: Names of the cached tables.
+        cache_format: Target format (None: ``default_cache_format()``).
+        date_columns (dict of str:list): Columns to parse as datetimes
+            during the migration, per table.
+        remove_source: Delete the CSV files after conversion.
+        date_format: Format of the snapshot dates in file names.
+        convert: Function ``(table, df) -> df`` applied to each table before
+            its date columns are parsed (e.g., to fix legacy values).
+
+    Returns: list of created files
+
+    """
+    source = get_cache_backend('csv')
+    target = get_cache_backend(cache_format)
+    if date_columns is None:
+        date_columns = {}
+    created = []
+
+    if target.name == source.name:
+        return created
+
+    for table in tables:
+        pattern = f'{cache_dir}/{community}_{table}_*.{source.extension}'
+        for fn in sorted(glob.glob(pattern)):
+            new_fn = target.path(cache_dir, community, table, snapshot_date(fn))
+            if os.path.exists(new_fn):
+                LOGGER.info(f"Skipping {fn}, {new_fn} exists.")
+                continue
+
+            df = source.read(fn)
+
+            # the CSV backend writes the frame's index as first column
+            if 'Unnamed: 0' in df.columns:
+                df = df.set_index('Unnamed: 0').rename_axis(None)
+
+            if convert is not None:
+                df = convert(table, df)
+            df = prepare_table(df, date_columns.get(table))
+
+            target.write(df, new_fn)
+            created.append(new_fn)
+            LOGGER.info(f"Migrated {fn} to {new_fn}.")
+
+            if remove_source:
+                os.remove(fn)
+
+    CacheManifest(cache_dir, community, tables, date_format).rebuild(
+        prefer=target.name).save()
+
+    return created
@@ -60,7 +60,8 @@ class DiscourseCommunity(Community):
                 
                 tp = data["topics"].rename(
                     columns={"slug":self.topic_column}
-                ).drop(['Unnamed: 0'], axis=1).drop_duplicates(subset=['id'])
+                ).drop(['Unnamed: 0'], axis=1, errors='ignore').drop_duplicates(
+                    subset=['id'])
                                
                 relevant_topics = d["posts"][self.topic_column]
                 d["topics"] = tp[tp[self.topic_column].isin(relevant_topics.tolist())].set_index(self.topic_column)
@@ -81,6 +82,17 @@ class DiscourseCommunityFactory(CommunityFactory):
     
     name = "discourse"
     cache_data = ['posts','users','topics']
+    cache_date_columns = {'posts': ['created_at']}
+    required_cache_columns = {
+        'posts': ['created_at', 'username', 'topic_slug', 'cooked'],
+        'users': ['username'],
+        'topics': ['slug', 'id']
+    }
+    cache_keys = {
+        'posts': ['id'],
+        'users': ['username'],
+        'topics': ['id']
+    }
     base_url = None
     scraping_urls = {
         "topics": "top/all.json",
@@ -4,12 +4,35 @@ import pandas as pd
 import scrapy
 from scrapyscript import Job, Processor
 import logging
+import datetime
 import numpy as np
 import json
 from urllib.parse import urlparse
 from pici.community import Community, CommunityFactory
 
 
+def absolute_dates(dates, today=None, yesterday=None):
+    """
+    Replace the relative days that the forum displays for recent posts
+    (e.g., 'Today 10:12:03') by absolute dates.
+
+    Args:
+        dates (pandas.Series): Dates as displayed in the forum.
+        today: Date of the scrape (None: the current date).
+        yesterday: Date of the day before (None: the day before ``today``).
+
+    Returns: pandas.Series
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    today = pd.Timestamp(datetime.date.today() if today is None else today)
+    yesterday = today - pd.Timedelta(days=1) if yesterday is None \
+        else pd.Timestamp(yesterday)
+
+    return dates.str.replace("Yesterday", str(yesterday.date())) \
+        .str.replace("Today", str(today.date()))
+
+
 class OSMCommunity(Community):
     name = "OpenStreetMap"
     date_column = "date"
@@ -42,12 +65,13 @@ class OSMCommunity(Community):
                 # fix paging issue
                 p["topic_id"] = p["topic_id"].apply(lambda x: x.split("&")[0])
 
-                # prepare date column in post data
-                p["date"] = pd.to_datetime(
-                    p[self._attr["original_date_column"]]
-                        .str.replace("Yesterday", self._attr["yesterday"])
-                        .str.replace("Today", self._attr["today"])
-                )
+                # prepare date column in post data (relative dates are only
+                # left in caches scraped before they were resolved)
+                p["date"] = pd.to_datetime(absolute_dates(
+                    p[self._attr["original_date_column"]],
+                    today=self._attr["today"],
+                    yesterday=self._attr["yesterday"]
+                ))
 
                 # set time slice
                 d['posts'] = self.timeslice(p, self.date_column, start, end)
@@ -77,13 +101,51 @@ class OSMCommunity(Community):
 class OSMCommunityFactory(CommunityFactory):
     name = "osm"
     cache_data = ['posts']
+    required_cache_columns = {
+        'posts': ['reply_date', 'reply_content', 'author_name', 'author_type',
+                  'author_from', 'author_registered_date', 'topic_id',
+                  'topic_title', 'topic_url', 'forum_title', 'forum_id',
+                  'forum_url']
+    }
+    cache_keys = {
+        'posts': ['reply_id']
+    }
+    cache_date_columns = {
+        'posts': ['reply_date']
+    }
 
     def _create_community(self, name, start, end):
         return OSMCommunity(name, self._data, start, end)
 
-    def scrape_data(self):
+    def _convert_legacy_table(self, table, df):
+        # resolve relative dates with the dates of the original scrape
+        if table == 'posts' and 'reply_date' in df.columns:
+            df = df.assign(reply_date=absolute_dates(
+                df['reply_date'],
+                today=OSMCommunity.DEFAULT_ATTRIBUTES['today'],
+                yesterday=OSMCommunity.DEFAULT_ATTRIBUTES['yesterday']
+            ))
+
+        return df
+
+    def _run_spider(self, since=None):
         processor = Processor(settings=None)
-        posts = pd.DataFrame(processor.run(Job(OSMSpider)))
+
+        return pd.DataFrame(processor.run(Job(OSMSpider, since=since)))
+
+    def _scrape_posts(self, since=None):
+        """
+        Run the spider and resolve the relative dates of recent posts
+        ('Today', 'Yesterday') to the date of the scrape.
+        """
+        posts = self._run_spider(since)
+        if 'reply_date' in posts.columns:
+            posts['reply_date'] = absolute_dates(posts['reply_date'])
+
+        return posts
+
+    def scrape_data(self):
+        posts = self._scrape_posts()
         self._data = {
             'posts': posts
         }
@@ -91,6 +153,18 @@ class OSMCommunityFactory(CommunityFactory):
             'posts': posts
         })
 
+    def scrape_delta(self, since):
+        """
+        Scrape all topics with posts after ``since``. Topics are re-scraped
+        completely, existing posts are replaced when the delta is merged
+        (by ``reply_id``).
+        """
+        posts = self._scrape_posts(since)
+
+        return {
+            'posts': posts
+        }
+
 
 class OSMSpider(scrapy.Spider):
     custom_settings = {
@@ -103,6 +177,22 @@ class OSMSpider(scrapy.Spider):
     name = 'OSMSpider'
     start_urls = ["https://forum.openstreetmap.org/"]
 
+    def __init__(self, since=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.since = pd.Timestamp(since) if since is not None else None
+
+    def _is_new(self, last_post):
+        """
+        Whether a topic's last post (as displayed in the forum, e.g.
+        'Today 10:12:03') is newer than ``since``.
+        """
+        if self.since is None or last_post is None:
+            return True
+        date = pd.to_datetime(absolute_dates(pd.Series([last_post])).iloc[0],
+                              errors='coerce')
+
+        return pd.isna(date) or date >= self.since
+
     def parse(self, response):
         for f in response.css('h3>a'):
             forum = {
@@ -115,19 +205,25 @@ class OSMSpider(scrapy.Spider):
                 yield response.follow(forum['forum_url'], callback=self.parse_forum, meta=forum)
 
     def parse_forum(self, response):
-        for t in response.css('td.tcl a'):
-            topic = {
-                "topic_title": t.css('::text').get(),
-                "topic_url": t.css('::attr(href)').get(),
-                "topic_id": t.css('::attr(href)').get().split("=")[1]
-            }
+        any_new = False
+        for row in response.css('tr'):
+            if not self._is_new(row.css('td.tcr a::text').get()):
+                continue
 
-            if topic['topic_url']:
-                yield response.follow(topic['topic_url'], callback=self.parse_topic, meta={**response.meta, **topic})
+            for t in row.css('td.tcl a'):
+                topic = {
+                    "topic_title": t.css('::text').get(),
+                    "topic_url": t.css('::attr(href)').get(),
+                    "topic_id": t.css('::attr(href)').get().split("=")[1]
+                }
+                any_new = True
 
-        # pagination
+                if topic['topic_url']:
+                    yield response.follow(topic['topic_url'], callback=self.parse_topic, meta={**response.meta, **topic})
+
+        # pagination (topics are ordered by last post, stop at old topics)
         next_page = response.css('a[rel="next"]::attr(href)').get()
-        if next_page:
+        if next_page and (any_new or self.since is None):
             yield response.follow(next_page, callback=self.parse_forum, meta=response.meta)
 
     def parse_topic(self, response):
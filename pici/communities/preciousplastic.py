@@ -67,7 +67,8 @@ class PPCommunity(Community):
             if isinstance(data['topics'], pd.DataFrame):
 
                 tp = data["topics"].drop_duplicates(subset=['id']).rename(
-                    columns={"id": self.topic_column}).drop(['Unnamed: 0'], axis=1)
+                    columns={"id": self.topic_column}).drop(['Unnamed: 0'], axis=1,
+                                                         errors='ignore')
 
                 relevant_topics = d["posts"][self.topic_column]
                 d["topics"] = tp[tp[self.topic_column].isin(relevant_topics.tolist())].set_index(self.topic_column)
@@ -86,6 +87,17 @@ class PPCommunity(Community):
 class PPCommunityFactory(CommunityFactory):
     name = "pp"
     cache_data = ['posts', 'users', 'topics']
+    cache_date_columns = {'posts': ['date']}
+    required_cache_columns = {
+        'posts': ['date', 'author', 'topic', 'text'],
+        'users': ['id'],
+        'topics': ['id']
+    }
+    cache_keys = {
+        'posts': ['topic', 'author', 'date'],
+        'users': ['id'],
+        'topics': ['id']
+    }
 
     def _create_community(self, name, start, end):
         try:
@@ -1,19 +1,210 @@
-import glob
 from abc import ABC, abstractmethod
+import copy
 import logging
-from collections import Counter
+import sys
+from collections import Counter, OrderedDict
 import datetime
 
 import pandas as pd
 import numpy as np
 
+from pici.cache import get_cache_backend, find_cache_files, \
+    backend_for_path, migrate_cache, prepare_table, window_bound, \
+    CacheManifest
+from pici.bundle import save_bundle, load_bundle
+from pici.shared import publish_community, attach_community
+from pici.graphs import SparseGraph
 from pici.helpers import create_co_contributor_graph, create_commenter_graph, \
-    where_all
+    add_node_attributes, co_contributor_adjacency, commenter_edges, \
+    graph_node_data, thread_structure, window_bounds, \
+    THREAD_STRUCTURE_COLUMNS
 from pici.registries import MetricRegistry, PreprocessorRegistry
+from pici.temporal import GRAPH_KINDS, TemporalEdges
 
 LOGGER = logging.getLogger(__name__)
 
 
+class ThreadIndex:
+    """
+    Thread-contiguous post store: posts sorted by (topic, date) with a
+    CSR-style offset index. The posts of the thread with topic code ``i``
+    (see ``Community.encode``) are the rows ``offsets[i]:offsets[i + 1]``
+    of ``posts``. Posts without topic are stored after all threads.
+
+    Args:
+        posts: pandas.DataFrame with a categorical ``topic_column``
+        topic_column: name of the topic column
+        date_column: name of the post date column
+    """
+
+    def __init__(self, posts, topic_column, date_column):
+        topics = posts[topic_column].cat
+        n = len(topics.categories)
+        codes = topics.codes.values.astype(np.int64)
+        codes[codes < 0] = n
+
+        self.source = posts
+        self.topics = topics.categories
+        self.order = np.lexsort((posts[date_column].values, codes))
+        self.codes = codes[self.order]
+        self.posts = posts.iloc[self.order]
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=n + 1)[:n],
+                  out=self.offsets[1:])
+
+    def __len__(self):
+        return len(self.topics)
+
+    def __iter__(self):
+        """
+        Iterate over (topic, posts) of all non-empty threads.
+        """
+        for i in np.flatnonzero(self.sizes):
+            yield self.topics[i], self.posts.iloc[self.slice(i)]
+
+    @property
+    def sizes(self):
+        """
+        Number of posts per thread (by topic code).
+        """
+        return np.diff(self.offsets)
+
+    def slice(self, code):
+        return slice(self.offsets[code], self.offsets[code + 1])
+
+    def thread(self, topic):
+        """
+        The posts of a thread, sorted by date.
+        """
+        return self.posts.iloc[self.slice(self.topics.get_loc(topic))]
+
+    def nunique(self, column):
+        """
+        Number of unique non-null values of ``column`` per thread (by topic
+        code).
+        """
+        values = self.posts[column]
+        valid = values.notna().values & (self.codes < len(self))
+        pairs = pd.DataFrame({
+            'thread': self.codes[valid],
+            'value': values.values[valid]
+        }).drop_duplicates()
+
+        return np.bincount(pairs['thread'].values, minlength=len(self))
+
+
+class GraphCache:
+    """
+    Least-recently-used cache of graphs. The cache is bounded by the number
+    of graphs (``maxsize``) and optionally by their estimated size in bytes
+    (``max_bytes``); the least recently used graphs are evicted first.
+
+    Args:
+        maxsize: Maximum number of cached graphs (None: unbounded).
+        max_bytes: Maximum estimated size of all cached graphs (None:
+            unbounded).
+    """
+
+    def __init__(self, maxsize=128, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._graphs = OrderedDict()
+        self._sizes = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._graphs)
+
+    def __contains__(self, key):
+        return key in self._graphs
+
+    @property
+    def nbytes(self):
+        """
+        Estimated size of all cached graphs in bytes.
+        """
+        return sum(self._sizes.values())
+
+    @staticmethod
+    def graph_size(graph):
+        """
+        Estimate the memory used by a networkx graph's node, adjacency and
+        attribute dicts (in bytes).
+        """
+        size = sys.getsizeof(graph._node) + sys.getsizeof(graph._adj)
+        for n, attr in graph._node.items():
+            size += sys.getsizeof(attr)
+        for n, nbrs in graph._adj.items():
+            size += sys.getsizeof(nbrs) + sum(
+                sys.getsizeof(attr) for attr in nbrs.values())
+
+        return size
+
+    def get(self, key, create):
+        """
+        Get the graph cached as ``key``, or create it with ``create()`` and
+        add it to the cache.
+        """
+        if key in self._graphs:
+            self.hits += 1
+            self._graphs.move_to_end(key)
+            return self._graphs[key]
+
+        self.misses += 1
+        graph = create()
+        self.add(key, graph)
+
+        return graph
+
+    def add(self, key, graph):
+        """
+        Add a graph to the cache (replacing a graph cached as ``key``).
+        """
+        self._graphs[key] = graph
+        self._graphs.move_to_end(key)
+        self._sizes[key] = self.graph_size(graph) if graph is not None else 0
+        self._evict()
+
+    def items(self):
+        return self._graphs.items()
+
+    def _evict(self):
+        while len(self._graphs) > 1 and (
+                (self.maxsize is not None and
+                 len(self._graphs) > self.maxsize) or
+                (self.max_bytes is not None and
+                 self.nbytes > self.max_bytes)):
+            key, _ = self._graphs.popitem(last=False)
+            del self._sizes[key]
+            self.evictions += 1
+
+    def invalidate(self, kind=None):
+        """
+        Remove all cached graphs, or only those of ``kind`` (first element
+        of the keys).
+        """
+        keys = [k for k in self._graphs if kind is None or k[0] == kind]
+        for k in keys:
+            del self._graphs[k]
+            del self._sizes[k]
+
+    @property
+    def stats(self):
+        """
+        Cache statistics: hits, misses, evictions, number of graphs and
+        their estimated size in bytes.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'graphs': len(self),
+            'bytes': self.nbytes
+        }
+
+
 class Community(ABC):
     """
     Abstract community class.
@@ -22,10 +213,38 @@ class Community(ABC):
 
     _co_contributor_graph = None
     _commenter_graph = None
-    _temporal_graphs = {
-        'co_contributor': {},
-        'commenter': {}
-    }
+    _sparse_graphs = None
+    _temporal_edges = None
+    graph_cache_size = 128
+    """
+    Maximum number of temporal graphs cached per community.
+    """
+
+    graph_cache_bytes = None
+    """
+    Maximum estimated size (in bytes) of the temporal graphs cached per
+    community (None: bounded by ``graph_cache_size`` only).
+    """
+
+    graph_node_attributes = True
+    """
+    Attach the contributors' attributes to the nodes of generated graphs.
+    If False, graphs have no node attributes, which makes building (temporal)
+    graphs cheaper; use ``graph_node_data`` to get them as table.
+    """
+
+    source = None
+    """
+    The cache snapshot the community was loaded from (see
+    ``CommunityFactory.cache_source``), None if it was scraped.
+    """
+
+    _graph_cache = None
+    _identifiers = None
+    _threads = None
+    _window = (None, None)
+    _root = None
+    _offset = 0
     _posts = None
     _metrics = None
     _data = None
@@ -38,33 +257,125 @@ class Community(ABC):
             self._attr = self.DEFAULT_ATTRIBUTES
         else:
             self._attr = attr
+        self._graph_cache = GraphCache(self.graph_cache_size,
+                                       self.graph_cache_bytes)
+        self._window = self._normalize_window(start, end)
         self._set_data(data, start, end)
+        self._sort_posts()
+        self._add_thread_structure()
+        self._encode_identifiers()
 
     def __str__(self):
         return self.name
 
     def __hash__(self):
-        return hash(str(self))
+        return hash((str(self), self._window))
 
     def __eq__(self, other):
         """
-        Two communities are the same if they have the same name. This is
-        used to simplify caching.
+        Two communities are the same if they have the same name and date
+        window. This is used to simplify caching.
+        """
+        return self.name == other.name and \
+            self._window == getattr(other, '_window', (None, None))
+
+    @staticmethod
+    def _normalize_window(start, end):
+        return tuple(None if d is None else pd.Timestamp(d)
+                     for d in (start, end))
+
+    @property
+    def window(self):
+        """
+        (start, end) of the community's date window (None: unbounded).
         """
-        return self.name == other.name
+        return self._window
 
     def date_range(self, start=None, end=None):
-        return type(self).__name__(self._data, start, end)
+        """
+        A view of the community that only contains posts with
+        ``start <= date < end``. The view's posts are a slice of the parent's
+        date-sorted ``posts`` (no data is re-loaded), with thread structure
+        columns (e.g., ``is_initial_post``) recalculated for the window, so
+        the view has the same posts as a community loaded with the window.
+        The view has its own graphs, metrics and preprocessors.
+
+        Args:
+            start: Start-date (inclusive), None: start of the community.
+            end: End-date (exclusive), None: end of the community.
+
+        Returns: pici.Community
+        """
+        start, end = self._normalize_window(start, end)
+        parent_start, parent_end = self._window
+        if parent_start is not None and (start is None or start < parent_start):
+            start = parent_start
+        if parent_end is not None and (end is None or end > parent_end):
+            end = parent_end
+
+        positions = self._date_slice(self.posts, self.date_column, start, end)
+        posts = self._with_thread_structure(self.posts.iloc[positions])
+        contributors = self.contributors[self.contributors.index.isin(
+            posts[self.contributor_column].unique())]
+        topics = self.topics[self.topics.index.isin(
+            posts[self.topic_column].unique())]
+
+        view = copy.copy(self)
+        view._window = (start, end)
+        view._root = self._root if self._root is not None else self
+        view._offset = self._offset + positions.start
+        view._posts = posts
+        view._contributors = contributors
+        view._topics = topics
+        view._data = {**self._data, 'posts': posts,
+                      'contributors': contributors, 'topics': topics}
+        view._co_contributor_graph = None
+        view._commenter_graph = None
+        view._sparse_graphs = None
+        view._temporal_edges = None
+        view._graph_cache = None
+        view._threads = None
+        view._metrics = None
+        view._preprocessors = None
+
+        return view
+
+    def _date_slice(self, posts, col, start, end, include_start=True):
+        """
+        Positions of the posts within the window as ``slice``. ``posts``
+        must be sorted by ``col`` (missing dates last).
+        """
+        dates = posts[col]
+        n = len(dates) - dates.isna().sum()
+        values = dates.iloc[:n].array
+        lo = 0 if start is None else values.searchsorted(
+            window_bound(start, dates.dtype),
+            side='left' if include_start else 'right')
+        hi = n if end is None else values.searchsorted(
+            window_bound(end, dates.dtype), side='left')
+
+        return slice(lo, max(lo, hi))
 
     def timeslice(self, posts, col, start, end):
+        """
+        Posts with ``start <= col < end``, found by binary search on posts
+        sorted by ``col``.
+        """
         if start is None and end is None:
             return posts
-        elif start is not None and end is not None:
-            return posts[(posts[col] >= start) & (posts[col] < end)]
-        elif start is None and end is not None:
-            return posts[posts[col] < end]
-        else:
-            return posts[posts[col] >= start]
+        if not posts[col].is_monotonic_increasing:
+            posts = posts.sort_values(col, kind='mergesort')
+
+        return posts.iloc[self._date_slice(posts, col, start, end)]
+
+    def _sort_posts(self):
+        """
+        Keep ``posts`` sorted by date (stable, missing dates last).
+        """
+        if not self._posts[self.date_column].is_monotonic_increasing:
+            self._posts = self._posts.sort_values(self.date_column,
+                                                  kind='mergesort')
+            self._data = {**(self._data or {}), 'posts': self._posts}
 
     @property
     @abstractmethod
@@ -103,6 +414,18 @@ class Community(ABC):
     def topics(self):
         return self._topics
 
+    @property
+    def threads(self):
+        """
+        Thread-contiguous index of ``posts`` (see ``ThreadIndex``). Created
+        on first access and re-created when ``posts`` are replaced.
+        """
+        if self._threads is None or self._threads.source is not self.posts:
+            self._threads = ThreadIndex(self.posts, self.topic_column,
+                                        self.date_column)
+
+        return self._threads
+
     @property
     def metrics(self):
         if self._metrics is None:
@@ -117,6 +440,152 @@ class Community(ABC):
 
         return self._preprocessors
 
+    def _add_thread_structure(self):
+        """
+        Add structural post columns (``THREAD_STRUCTURE_COLUMNS``, see
+        ``pici.helpers.thread_structure``) to ``posts``. The columns
+        describe the posts of the community's date window, e.g., the first
+        post of a thread within the window is its initial post. Columns
+        that were stored with a full cache snapshot are reused if the
+        community has no window, as they were calculated from the same
+        posts; otherwise they are calculated from the loaded posts.
+        """
+        posts = self._posts
+        if self._window == (None, None) and \
+                all(c in posts.columns for c in THREAD_STRUCTURE_COLUMNS):
+            # CSV caches store datetimes as strings
+            dates = {
+                c: pd.to_datetime(posts[c])
+                for c in THREAD_STRUCTURE_COLUMNS
+                if 'date' in c and not pd.api.types.is_datetime64_any_dtype(
+                    posts[c])
+            }
+            if dates:
+                posts = posts.assign(**dates)
+        else:
+            posts = self._with_thread_structure(posts)
+
+        self._posts = posts
+        self._data = {**(self._data or {}), 'posts': posts}
+
+    def _with_thread_structure(self, posts):
+        """
+        ``posts`` with (re-)calculated ``THREAD_STRUCTURE_COLUMNS``, which
+        then describe only these posts. Thread initiators are encoded with
+        the community's contributor categories, if these exist.
+        """
+        structure = thread_structure(posts, self.date_column,
+                                     self.topic_column,
+                                     self.contributor_column)
+        if self._identifiers is not None:
+            structure['thread_initiator'] = pd.Categorical(
+                structure['thread_initiator'],
+                categories=self._identifiers['contributors'])
+
+        return posts.assign(**{c: structure[c].array
+                               for c in THREAD_STRUCTURE_COLUMNS})
+
+    @staticmethod
+    def _categories(*values):
+        """
+        Shared, sorted categories of all non-null ``values``.
+        """
+        categories = pd.Index(
+            pd.concat([pd.Series(np.asarray(v, dtype=object)) for v in values])
+            .dropna().unique()
+        )
+        try:
+            return categories.sort_values()
+        except TypeError:
+            # mixed types can not be sorted
+            return categories
+
+    def _encode_identifiers(self):
+        """
+        Intern contributor names and topic ids as pandas categoricals that
+        share one set of categories across ``posts``, ``contributors`` and
+        ``topics``. Grouping, joins and comparisons on these columns then
+        work on integer codes.
+        """
+        self._identifiers = {
+            'contributors': self._categories(
+                self._posts[self.contributor_column],
+                self._posts['thread_initiator'],
+                self._contributors.index),
+            'topics': self._categories(
+                self._posts[self.topic_column],
+                self._topics.index)
+        }
+        posts = self._posts.assign(**{
+            self.contributor_column: pd.Categorical(
+                self._posts[self.contributor_column],
+                categories=self._identifiers['contributors']),
+            'thread_initiator': pd.Categorical(
+                self._posts['thread_initiator'],
+                categories=self._identifiers['contributors']),
+            self.topic_column: pd.Categorical(
+                self._posts[self.topic_column],
+                categories=self._identifiers['topics'])
+        })
+        contributors = self._contributors.set_axis(pd.CategoricalIndex(
+            self._contributors.index,
+            categories=self._identifiers['contributors'],
+            name=self._contributors.index.name
+        ), axis=0)
+        topics = self._topics.set_axis(pd.CategoricalIndex(
+            self._topics.index,
+            categories=self._identifiers['topics'],
+            name=self._topics.index.name
+        ), axis=0)
+
+        self._posts = posts
+        self._contributors = contributors
+        self._topics = topics
+        self._data = {**(self._data or {}), 'posts': posts,
+                      'contributors': contributors, 'topics': topics}
+
+    def identifiers(self, kind='contributors'):
+        """
+        The categories (names / ids) of contributors or topics. A
+        contributor's or topic's code is its position in this index.
+
+        Args:
+            kind: 'contributors' or 'topics'
+
+        Returns: pandas.Index
+        """
+        return self._identifiers[kind]
+
+    def encode(self, values, kind='contributors'):
+        """
+        Map contributor names (or topic ids) to their integer codes (-1 for
+        unknown values).
+        """
+        return self._identifiers[kind].get_indexer(
+            pd.Index(np.asarray(values, dtype=object)))
+
+    def decode(self, codes, kind='contributors'):
+        """
+        Map integer codes back to contributor names (or topic ids).
+        """
+        return pd.Categorical.from_codes(
+            np.asarray(codes), categories=self._identifiers[kind]
+        ).astype(object)
+
+    @property
+    def contributor_codes(self):
+        """
+        Integer code of each post's contributor (aligned with ``posts``).
+        """
+        return self.posts[self.contributor_column].cat.codes.values
+
+    @property
+    def topic_codes(self):
+        """
+        Integer code of each post's topic (aligned with ``posts``).
+        """
+        return self.posts[self.topic_column].cat.codes.values
+
     def contributor_by_id(self, c_id):
         return self.contributors.loc[c_id]
 
@@ -130,7 +599,8 @@ class Community(ABC):
                                  kind='co_contributor'):
         """
         Generate a graph based only on posts created after start (>) and
-        before end (<).
+        before end (<). Graphs of all posts before end are sliced from the
+        community's ``temporal_edges``.
 
         Args:
             start: datetime
@@ -140,50 +610,51 @@ class Community(ABC):
         Returns: networkx graph
 
         """
-        post_criteria = []
-        if start is not None:
-            post_criteria.append((self.posts[self.date_column] > start))
-        if end is not None:
-            post_criteria.append((self.posts[self.date_column] < end))
+        if start is None and kind in GRAPH_KINDS:
+            G = self.temporal_edges(kind).to_networkx(end)
+            if self.graph_node_attributes:
+                add_node_attributes(G, self.contributors,
+                                    self.contributors.columns)
+            return G
+
+        posts = self.posts.iloc[self._date_slice(
+            self.posts, self.date_column, start, end, include_start=False)]
+
+        return self._create_graph(posts, kind)
 
+    def _create_graph(self, posts, kind):
         if kind == 'co_contributor':
-            return create_co_contributor_graph(
-                #self.posts[(np.logical_and(*post_criteria))],
-                self.posts[where_all(post_criteria)],
-                self.contributors,
-                self.contributor_column,
-                self.topic_column,
-                self.contributors.columns
-            )
+            create = create_co_contributor_graph
         elif kind == 'commenter':
-            return create_commenter_graph(
-                #self.posts[(np.logical_and(*post_criteria))],
-                self.posts[where_all(post_criteria)],
-                self.contributors,
-                self.contributor_column,
-                self.topic_column,
-                self.contributors.columns
-            )
+            create = create_commenter_graph
         else:
             return None
 
-    def _generate_co_contributor_graph(self):
-        return create_co_contributor_graph(
-            self.posts,
+        return create(
+            posts,
             self.contributors,
             self.contributor_column,
             self.topic_column,
-            self.contributors.columns
+            self.contributors.columns if self.graph_node_attributes else None
         )
 
+    def _generate_co_contributor_graph(self):
+        return self._create_graph(self.posts, 'co_contributor')
+
     def _generate_commenter_graph(self):
-        return create_commenter_graph(
-            self.posts,
-            self.contributors,
-            self.contributor_column,
-            self.topic_column,
-            self.contributors.columns
-        )
+        return self._create_graph(self.posts, 'commenter')
+
+    def graph_node_data(self, graph):
+        """
+        The contributors that are nodes of ``graph``, i.e., its node
+        attributes as table.
+
+        Args:
+            graph: networkx graph (e.g., ``co_contributor_graph``)
+
+        Returns: pandas.DataFrame
+        """
+        return graph_node_data(graph, self.contributors)
 
     @property
     def co_contributor_graph(self):
@@ -199,6 +670,59 @@ class Community(ABC):
 
         return self._commenter_graph
 
+    def sparse_graph(self, kind='co_contributor'):
+        """
+        The co-contributor or commenter graph as ``pici.graphs.SparseGraph``
+        (sparse adjacency matrix and node index), built from the posts
+        without creating a networkx graph. Cached.
+
+        Args:
+            kind: string ('co_contributor' or 'commenter').
+
+        Returns: pici.graphs.SparseGraph
+        """
+        if self._sparse_graphs is None:
+            self._sparse_graphs = {}
+        if kind not in self._sparse_graphs:
+            self._sparse_graphs[kind] = self._generate_sparse_graph(kind)
+
+        return self._sparse_graphs[kind]
+
+    def _generate_sparse_graph(self, kind):
+        if kind == 'co_contributor':
+            adjacency, nodes = co_contributor_adjacency(
+                self.posts, self.contributor_column, self.topic_column)
+            return SparseGraph(adjacency, nodes, directed=False)
+        elif kind == 'commenter':
+            edges = commenter_edges(self.posts, self.contributor_column,
+                                    self.topic_column)
+            codes, nodes = pd.factorize(pd.concat(
+                [edges['source'], edges['target']], ignore_index=True))
+            return SparseGraph.from_edges(
+                codes[:len(edges)], codes[len(edges):], edges['weight'],
+                nodes, directed=True)
+        else:
+            raise ValueError(f"Unknown graph kind {kind}.")
+
+    def temporal_edges(self, kind='co_contributor'):
+        """
+        The co-contributor or commenter graph as timestamped edge table
+        (see ``pici.temporal.TemporalEdges``), from which the graph as of
+        any date is sliced. Cached.
+
+        Args:
+            kind: string ('co_contributor' or 'commenter').
+
+        Returns: pici.temporal.TemporalEdges
+        """
+        if self._temporal_edges is None:
+            self._temporal_edges = {}
+        if kind not in self._temporal_edges:
+            self._temporal_edges[kind] = TemporalEdges.from_community(self,
+                                                                      kind)
+
+        return self._temporal_edges[kind]
+
     def temporal_graph(self, start=None, end=None, kind='co_contributor'):
         """
         Cached access to temporal graphs.
@@ -211,12 +735,230 @@ class Community(ABC):
         Returns: networkx Graph or DiGraph
 
         """
-        k = (start, end)
-        if k not in self._temporal_graphs[kind].keys():
-            self._temporal_graphs[kind][k] = self._generate_temporal_graph(
-                start, end, kind)
+        # graphs are cached by the range of posts they are based on (as
+        # positions in the date-sorted posts of the community that views
+        # were created from), so views share the graphs of their parent
+        positions = self._date_slice(self.posts, self.date_column, start,
+                                     end, include_start=False)
+        key = (kind, self._offset + positions.start,
+               self._offset + positions.stop)
+
+        return self.graph_cache.get(
+            key,
+            lambda: self._generate_temporal_graph(start, end, kind)
+        )
 
-        return self._temporal_graphs[kind][k]
+    def temporal_graphs(self, ends, kind='co_contributor', copy=True):
+        """
+        Snapshots of the temporal graph (all posts before ``end``) for each
+        of the sorted dates ``ends``. The snapshots are built incrementally
+        from the temporal edge table (see ``temporal_edges`` and
+        ``pici.temporal.TemporalEdges.snapshots``) and are not cached.
+
+        Args:
+            ends: iterable of sorted dates
+            kind: string ('co_contributor' or 'commenter').
+            copy: Yield independent graphs. If False, one graph is updated
+                and yielded for all dates.
+
+        Yields: tuples of (end, networkx Graph or DiGraph)
+        """
+        return self.temporal_edges(kind).snapshots(ends, copy=copy)
+
+    @property
+    def graph_cache(self):
+        """
+        The cache of temporal graphs (see ``GraphCache``). Views created by
+        ``date_range`` share the cache of the community they were created
+        from.
+        """
+        owner = self._root if self._root is not None else self
+
+        return owner._graph_cache
+
+    def invalidate_graphs(self, kind=None):
+        """
+        Drop cached graphs (e.g., after changing posts or contributors).
+
+        Args:
+            kind: None (all graphs) or 'co_contributor' / 'commenter'.
+        """
+        if kind in (None, 'co_contributor'):
+            self._co_contributor_graph = None
+        if kind in (None, 'commenter'):
+            self._commenter_graph = None
+        self._sparse_graphs = None if kind is None else {
+            k: g for k, g in (self._sparse_graphs or {}).items() if k != kind
+        }
+        self._temporal_edges = None if kind is None else {
+            k: e for k, e in (self._temporal_edges or {}).items() if k != kind
+        }
+        self.graph_cache.invalidate(kind)
+
+    def windows(self, freq='MS', size=None, start=None, end=None):
+        """
+        Iterate over fixed or sliding date windows of the community. The
+        windows are views (see ``date_range``) that slice the community's
+        (preprocessed) posts and share its cache of temporal graphs. Each
+        window calculates the thread structure of its posts and computes
+        and caches its metrics for its own posts, so the results are the
+        same as for a community loaded with the window's dates.
+
+        Args:
+            freq: Frequency of window starts as pandas offset alias, e.g.,
+                'MS' (month start), 'QS' (quarter start) or '7D'.
+            size: Length of each window (offset alias). None (default):
+                ``freq``, i.e., consecutive windows. Windows that are
+                longer than ``freq`` overlap (sliding windows).
+            start: Start of the first window (None: the community's start,
+                or its first post rolled back to ``freq``).
+            end: End of the last window (None: the community's end, or
+                after its last post).
+
+        Yields: tuples of (window start, pici.Community)
+        """
+        dates = self.posts[self.date_column].dropna()
+        if start is None:
+            start = self._window[0]
+        if end is None:
+            end = self._window[1]
+        for w_start, w_end in window_bounds(
+                dates.min() if start is None else start,
+                dates.max() if end is None else end,
+                freq=freq, size=size, rollback=start is None,
+                include_end=end is None):
+            yield w_start, self.date_range(w_start, w_end)
+
+    def save_bundle(self, path, parameters=None):
+        """
+        Save the community, including preprocessed columns and built graphs,
+        as bundle (see ``pici.bundle``).
+
+        Args:
+            path: Bundle directory.
+            parameters: Preprocessing parameters that were used (stored to
+                detect stale bundles).
+
+        Returns: path
+        """
+        return save_bundle(self, path, parameters)
+
+    @staticmethod
+    def load_bundle(path, source=None, parameters=None, window=None):
+        """
+        Restore a community from a bundle (see ``pici.bundle``).
+
+        Args:
+            path: Bundle directory.
+            source: Cache snapshot the bundle has to be created from (see
+                ``CommunityFactory.cache_source``, None: do not check).
+            parameters: Preprocessing parameters the bundle has to be
+                created with (None: do not check).
+            window: (start, end) the bundle has to have (None: do not
+                check).
+
+        Raises:
+            ValueError: if the bundle is missing or stale.
+
+        Returns: pici.Community
+        """
+        return load_bundle(path, source, parameters, window)
+
+    def share(self, copy_objects=False):
+        """
+        Publish the community's numeric, datetime and categorical columns to
+        shared memory, so that worker processes can attach to them without
+        copying (see ``pici.shared``).
+
+        Args:
+            copy_objects: Also pass object columns (e.g., texts) to workers,
+                as copies.
+
+        Returns: pici.shared.SharedCommunityData
+        """
+        return publish_community(self, copy_objects=copy_objects)
+
+    @staticmethod
+    def attach(handle):
+        """
+        Create a community backed by data published with ``share``.
+
+        Returns: pici.Community
+        """
+        return attach_community(handle)
+
+    def _get_state(self):
+        """
+        Attributes (besides name, window, source and tables) needed to
+        re-create the community with ``_from_tables``.
+        """
+        return {
+            'attr': self._attr,
+            'identifiers': self._identifiers
+        }
+
+    def _get_bundle_graphs(self):
+        graphs = {
+            'co_contributor': self._co_contributor_graph,
+            'commenter': self._commenter_graph,
+            'temporal': {}
+        }
+        # keys of temporal graphs of views refer to their parent's posts
+        if self._root is None:
+            graphs['temporal'] = dict(self.graph_cache.items())
+
+        return graphs
+
+    @classmethod
+    def _from_bundle(cls, manifest, tables, state, graphs):
+        community = cls._from_tables(manifest['name'], manifest['window'],
+                                     manifest['source'], tables, state)
+        community._co_contributor_graph = graphs['co_contributor']
+        community._commenter_graph = graphs['commenter']
+        for key, graph in graphs['temporal'].items():
+            community._graph_cache.add(key, graph)
+
+        return community
+
+    @classmethod
+    def _from_tables(cls, name, window, source, tables, state):
+        """
+        Re-create a community from its (already prepared) tables, without
+        running ``_set_data`` and the encoding of identifiers again.
+        """
+        community = cls.__new__(cls)
+        community.name = name
+        community._attr = state['attr']
+        community._identifiers = state['identifiers']
+        community._window = cls._normalize_window(*window)
+        community.source = source
+        community._posts = tables['posts']
+        community._contributors = tables['contributors']
+        community._topics = tables['topics']
+        community._data = dict(tables)
+        community._graph_cache = GraphCache(cls.graph_cache_size,
+                                            cls.graph_cache_bytes)
+
+        return community
+
+    def release(self):
+        """
+        Drop the community's data, graphs and metric / preprocessor
+        registries so their memory can be reclaimed.
+        """
+        self._co_contributor_graph = None
+        self._commenter_graph = None
+        self._sparse_graphs = None
+        self._temporal_edges = None
+        self._graph_cache = GraphCache(self.graph_cache_size,
+                                       self.graph_cache_bytes)
+        self._threads = None
+        self._metrics = None
+        self._preprocessors = None
+        self._data = None
+        self._posts = None
+        self._contributors = None
+        self._topics = None
 
     @abstractmethod
     def _set_data(self, data, start=None, end=None):
@@ -226,19 +968,78 @@ class Community(ABC):
 class CommunityFactory(ABC):
 
     cache_date_format = '%Y-%m-%d-%H-%M-%S'
+    cache_date_columns = {}
+    """
+    Columns (per cached table) that contain datetimes. These are stored as
+    typed datetime columns by cache formats that support it.
+    """
 
-    def __init__(self, cache_dir='.', cache_nrows=None):
+    required_cache_columns = {}
+    """
+    Columns (per cached table) that are needed to set up the community.
+    These are always loaded when the loaded columns are restricted.
+    """
+
+    cache_keys = {}
+    """
+    Columns (per cached table) that identify a row. Used to de-duplicate
+    rows when merging delta snapshots, so they are always loaded when the
+    loaded columns are restricted.
+    """
+
+    derived_cache_columns = {'posts': THREAD_STRUCTURE_COLUMNS}
+    """
+    Columns (per cached table) that are calculated by the community when
+    a full snapshot is written and stored with it. These are always loaded
+    when the loaded columns are restricted. Communities reuse them if the
+    complete snapshot is loaded without date window; otherwise they are
+    calculated from the loaded rows.
+    """
+
+    def __init__(self, cache_dir='.', cache_nrows=None, cache_format=None,
+                 cache_columns=None):
+        """
+        Args:
+            cache_dir: Path to folder that contains cache files.
+            cache_nrows: Number of rows to load from cache (None: all rows).
+            cache_format: Format of new cache files (see
+                ``pici.cache.CACHE_BACKENDS``).
+            cache_columns (dict of str:list): Columns to load per cached
+                table, in addition to ``required_cache_columns``. Tables
+                that are not listed are loaded completely (None: load all
+                columns).
+        """
         self.cache_dir = cache_dir
         self.cache_nrows = cache_nrows
+        self.cache_backend = get_cache_backend(cache_format)
+        self.cache_columns = cache_columns
+        self.manifest = CacheManifest(cache_dir, self.name, self.cache_data,
+                                      self.cache_date_format)
+        self.source = None
         self._data = None
 
+    def _projected_columns(self, table):
+        if self.cache_columns is None or table not in self.cache_columns:
+            return None
+
+        return set(self.cache_columns[table]) | set(
+            self.required_cache_columns.get(table, [])) | set(
+            self.derived_cache_columns.get(table, [])) | set(
+            self.cache_keys.get(table, []))
+
+    def _cache_files(self, table):
+        return find_cache_files(self.cache_dir, self.name, table,
+                                prefer=self.cache_backend.name)
+
     def _cache_exists(self):
+        if self.manifest.exists:
+            return self.manifest.latest is not None
 
-        files = [f'{self.cache_dir}/{self.name}_{d}_*.csv'
+        files = [f'{self.cache_dir}/{self.name}_{d}_*.*'
                  for d in self.cache_data]
 
         found = all([
-            any(glob.iglob(f'{self.cache_dir}/{self.name}_{d}_*.csv'))
+            len(self._cache_files(d)) > 0
             for d in self.cache_data
         ])
 
@@ -249,17 +1050,25 @@ class CommunityFactory(ABC):
 
         return found
 
-    def load_cache(self):
+    def _window_column(self, table):
+        date_columns = self.cache_date_columns.get(table)
+        return date_columns[0] if date_columns else None
+
+    def _scan_cache(self):
+        """
+        Find the files of the most recent complete snapshot by scanning the
+        cache directory (used if there is no manifest).
+        """
         cache = {
-            k: glob.glob(f'{self.cache_dir}/{self.name}_{k}_*.csv')
+            k: self._cache_files(k)
             for k in self.cache_data
         }
 
         # get most recent date for which every cached file exists
         all_dates = [
-            fn.split("_")[-1].split(".")[0]
+            d
             for k in cache.keys()
-            for fn in cache[k]
+            for d in cache[k].keys()
         ]
         d_counts = Counter(all_dates)
         valid_dates = [
@@ -273,29 +1082,338 @@ class CommunityFactory(ABC):
             reverse=True
         )[0]
 
-        self._data = {
-            k: pd.read_csv(
-                f'{self.cache_dir}/{self.name}_{k}_{most_recent_date}.csv',
-                nrows=self.cache_nrows
+        return most_recent_date, {
+            k: cache[k][most_recent_date] for k in self.cache_data
+        }
+
+    def _latest_snapshot(self):
+        """
+        Date, files and deltas (list of (date, files)) of the most recent
+        complete snapshot.
+        """
+        if self.manifest.exists:
+            problems = self.manifest.verify()
+            if problems:
+                LOGGER.warning("Cache manifest is outdated, scanning cache "
+                               "directory instead: " + " ".join(problems))
+            else:
+                return self.manifest.latest, self.manifest.files(), [
+                    (d, self.manifest.files(d))
+                    for d in self.manifest.deltas()
+                ]
+
+        return self._scan_cache() + ([],)
+
+    def _source(self, date, deltas):
+        return {
+            'community': self.name,
+            'snapshot': date,
+            'deltas': list(deltas),
+            'cache_nrows': self.cache_nrows,
+            'cache_columns': None if self.cache_columns is None else {
+                k: sorted(v) for k, v in self.cache_columns.items()
+            }
+        }
+
+    def cache_source(self):
+        """
+        Identifies the data that ``load_cache`` currently loads: the most
+        recent snapshot, its deltas and the row / column restrictions.
+
+        Returns: dict
+        """
+        date, _, deltas = self._latest_snapshot()
+
+        return self._source(date, [d for d, _ in deltas])
+
+    def load_cache(self, start=None, end=None):
+        """
+        Load the most recent complete snapshot from cache.
+
+        If ``start`` or ``end`` are set, tables with date columns (see
+        ``cache_date_columns``) are filtered while reading, so that only
+        rows in the date window are loaded. If ``cache_columns`` is set,
+        only the selected columns are read.
+
+        Args:
+            start: Start-date (inclusive) of the window.
+            end: End-date (exclusive) of the window.
+        """
+        date, files, deltas = self._latest_snapshot()
+        self.source = self._source(date, [d for d, _ in deltas])
+
+        def read(k, path):
+            return backend_for_path(path).read(
+                path,
+                nrows=self.cache_nrows,
+                date_column=self._window_column(k),
+                start=start,
+                end=end,
+                columns=self._projected_columns(k)
             )
+
+        self._data = {
+            k: self._merge_deltas(k, read(k, files[k]), [
+                read(k, delta[k]) for _, delta in deltas if k in delta
+            ])
             for k in self.cache_data
         }
+        if self.cache_nrows is not None:
+            # derived columns describe the complete snapshot, not the rows
+            # that were loaded
+            self._data = {
+                k: d.drop(columns=self.derived_cache_columns.get(k, []),
+                          errors='ignore')
+                for k, d in self._data.items()
+            }
+
+    def _merge_deltas(self, table, base, deltas):
+        """
+        Append delta partitions to a base table. Rows of later partitions
+        replace earlier rows with the same key (see ``cache_keys``).
 
-    def add_data_to_cache(self, data):
-        date_now = datetime.date.today().strftime(self.cache_date_format)
+        Raises:
+            ValueError: if a partition lacks the key columns.
+        """
+        if len(deltas) == 0:
+            return base
+        # derived columns of the base snapshot do not cover the deltas
+        derived = self.derived_cache_columns.get(table, [])
+        keys = self.cache_keys.get(table, [])
+        for partition in [base] + deltas:
+            missing = [k for k in keys if k not in partition.columns]
+            if missing:
+                raise ValueError(f"Can not merge delta snapshots of {table}, "
+                                 f"key columns {missing} are missing.")
+        merged = pd.concat([base] + deltas, ignore_index=True).drop(
+            columns=derived, errors='ignore')
+        if keys:
+            merged = merged.drop_duplicates(subset=keys, keep='last')
+
+        return merged
+
+    def _high_water_mark(self, data, scraped_at):
+        """
+        Latest post date in ``data`` (if the posts have a date column),
+        otherwise the time of scraping.
+        """
+        column = self._window_column('posts')
+        if 'posts' in data and column in data['posts'].columns:
+            latest = pd.to_datetime(data['posts'][column],
+                                    errors='coerce').max()
+            if not pd.isna(latest):
+                return latest.isoformat()
+
+        return scraped_at.isoformat()
+
+    def _add_derived_columns(self, data):
+        """
+        Add the ``derived_cache_columns`` of a community created from
+        ``data`` (without date window) to the tables in ``data``.
+        """
+        if not all(k in data for k in self.cache_data):
+            return data
+        current = self._data
+        self._data = {k: d.copy() for k, d in data.items()}
+        try:
+            community = self._create_community(None, None, None)
+        finally:
+            self._data = current
+
+        data = dict(data)
+        for k, columns in self.derived_cache_columns.items():
+            derived = getattr(community, f'_{k}')[columns]
+            if k not in data or len(derived) != len(data[k]):
+                LOGGER.warning(f"Could not add derived columns to {k}.")
+                continue
+            data[k] = data[k].assign(**{
+                c: np.asarray(derived[c], dtype=object)
+                if isinstance(derived[c].dtype, pd.CategoricalDtype)
+                else derived[c].array
+                for c in columns
+            })
+
+        return data
+
+    def _new_snapshot_date(self, now):
+        """
+        Date (identifier) of a new snapshot written at ``now``. Snapshot
+        dates have the resolution of ``cache_date_format`` (seconds), so if
+        a snapshot with that date exists already (e.g., a base snapshot
+        written in the same second), the next free date is used.
+        """
+        taken = set(self.manifest.snapshots)
+        for k in self.cache_data:
+            for table in [k, f'{k}{self.manifest.delta_suffix}']:
+                taken.update(find_cache_files(self.cache_dir, self.name,
+                                              table))
+        date = now.strftime(self.cache_date_format)
+        while date in taken:
+            now += datetime.timedelta(seconds=1)
+            date = now.strftime(self.cache_date_format)
+
+        return date
+
+    def add_data_to_cache(self, data, delta=False):
+        """
+        Write a new snapshot to the cache. Full snapshots are stored with
+        the ``derived_cache_columns`` of the community, so these do not
+        have to be calculated when the snapshot is loaded.
+
+        Args:
+            data (dict of str:pandas.DataFrame): Tables to cache.
+            delta: Whether ``data`` only contains content scraped after the
+                latest snapshot's high-water mark. Delta snapshots are
+                merged into the latest full snapshot when loading.
+        """
+        now = datetime.datetime.now()
+        date_now = self._new_snapshot_date(now)
+        base = None
+        suffix = ''
+        if delta:
+            base = self.manifest.latest
+            suffix = self.manifest.delta_suffix
+            if base is None:
+                raise ValueError("Can not add delta snapshot, there is no "
+                                 "full snapshot in the cache manifest.")
+        else:
+            data = self._add_derived_columns(data)
         for k, d in data.items():
-            d.to_csv(f'{self.cache_dir}/{self.name}_{k}_{date_now}.csv')
+            d = prepare_table(d, self.cache_date_columns.get(k))
+            path = self.cache_backend.path(self.cache_dir, self.name,
+                                           f'{k}{suffix}', date_now)
+            self.cache_backend.write(d, path)
+            self.manifest.add(date_now, k, path, df=d, base=base)
+        self.manifest.set_high_water_mark(
+            date_now, self._high_water_mark(data, now))
+        self.manifest.save()
+
+    def update_cache(self):
+        """
+        Incrementally update the cache: scrape only content that is newer
+        than the cache's high-water mark and store it as delta snapshot.
+        If there is no snapshot yet, or the factory does not support
+        incremental scraping (see ``scrape_delta``), the complete community
+        is scraped.
+
+        Returns: dict of str:pandas.DataFrame (the scraped delta)
+        """
+        if not self.manifest.exists and self._cache_exists():
+            self.rebuild_cache_manifest()
+        since = self.manifest.high_water_mark
+        if since is None:
+            self.scrape_data()
+            return self._data
+
+        LOGGER.info(f"Scraping content newer than {since}...")
+        try:
+            data = self.scrape_delta(pd.Timestamp(since))
+        except NotImplementedError:
+            LOGGER.warning(f"{type(self).__name__} does not support "
+                           f"incremental scraping. Scraping community "
+                           f"data...")
+            self.scrape_data()
+            return self._data
+        self.add_data_to_cache(data, delta=True)
+
+        return data
+
+    def compact_cache(self):
+        """
+        Merge the latest full snapshot and its deltas into a new full
+        snapshot. This also stores the ``derived_cache_columns`` with
+        snapshots that were written without them.
+        """
+        nrows, columns = self.cache_nrows, self.cache_columns
+        self.cache_nrows, self.cache_columns = None, None
+        try:
+            self.load_cache()
+        finally:
+            self.cache_nrows, self.cache_columns = nrows, columns
+        self.add_data_to_cache(self._data)
+
+    def rebuild_cache_manifest(self, checksum=True):
+        """
+        Re-create the cache manifest from the files in the cache directory
+        (e.g., for caches created before manifests existed, or after cache
+        files were added or removed manually).
+        """
+        self.manifest.rebuild(prefer=self.cache_backend.name,
+                              checksum=checksum).save()
+
+    def verify_cache(self, checksums=False):
+        """
+        Check that the most recent snapshot listed in the manifest is
+        complete and its files are intact.
+
+        Args:
+            checksums: Also compare file checksums (reads all files).
+
+        Returns: list of problems (empty if the cache is valid).
+        """
+        return self.manifest.verify(checksums=checksums)
+
+    def _convert_legacy_table(self, table, df):
+        """
+        Fix values of a cached table written by older versions of the
+        factory before it is migrated (see ``migrate_cache``).
+        """
+        return df
+
+    def migrate_cache(self, remove_source=False):
+        """
+        Convert all CSV snapshots of this community to the factory's cache
+        format (one-shot migration of existing caches) and write the cache
+        manifest.
+
+        Args:
+            remove_source: Delete CSV files after conversion.
+
+        Returns: list of created files
+
+        """
+        created = migrate_cache(
+            self.cache_dir, self.name, self.cache_data,
+            cache_format=self.cache_backend.name,
+            date_columns=self.cache_date_columns,
+            remove_source=remove_source,
+            date_format=self.cache_date_format,
+            convert=self._convert_legacy_table
+        )
+        self.manifest.load()
+
+        return created
 
     def create_community(self, name=None, use_cache=True,
                          start=None, end=None):
         if use_cache and self._cache_exists():
             LOGGER.info("Loading community from cache...")
-            self.load_cache()
+            self.load_cache(start, end)
         else:
             LOGGER.warning("No data in cache. Scraping community data...")
+            self.source = None
             self.scrape_data()
 
-        return self._create_community(name, start, end)
+        community = self._create_community(name, start, end)
+        community.source = self.source
+
+        return community
+
+    def load_bundle(self, path, start=None, end=None, parameters=None):
+        """
+        Restore a preprocessed community from a bundle (see
+        ``Community.save_bundle``), if the bundle was created from the
+        current cache snapshot with the same date window and preprocessing
+        parameters.
+
+        Raises:
+            ValueError: if the bundle is missing or stale.
+
+        Returns: pici.Community
+        """
+        return Community.load_bundle(path, source=self.cache_source(),
+                                     parameters=parameters,
+                                     window=(start, end))
 
     def load_labels(self):
         pass
@@ -313,3 +1431,17 @@ class CommunityFactory(ABC):
     @abstractmethod
     def scrape_data(self):
         pass
+
+    def scrape_delta(self, since):
+        """
+        Scrape content created or changed after ``since``. Factories that
+        do not implement it are updated by a full scrape (see
+        ``update_cache``).
+
+        Args:
+            since (pandas.Timestamp): High-water mark of the cache.
+
+        Returns: dict of str:pandas.DataFrame
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support incremental scraping.")
@@ -0,0 +1,477 @@
+"""
+Graph representations for network metrics.
+
+``SparseGraph`` is a compact alternative to the networkx graphs of a
+community: a weighted ``scipy.sparse`` CSR adjacency matrix plus an index
+of node labels (node id ``i`` is row and column ``i`` of the matrix).
+Degrees and eigenvector, closeness and betweenness centrality are computed
+with sparse matrix operations and match the networkx implementations
+(which the metrics use unweighted).
+
+``IGraph`` runs the same centralities on a (cached) ``igraph.Graph``
+conversion of a networkx graph, using igraph's C implementations, and
+scales their results like networkx does.
+
+Examples:
+    === "Python"
+    ``` py
+    g = community.sparse_graph('co_contributor')
+    g.eigenvector_centrality()
+    ```
+"""
+import math
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+import igraph as ig
+import networkx as nx
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+
+
+class SparseGraph:
+    """
+    Graph stored as sparse adjacency matrix.
+
+    Args:
+        adjacency: (n, n) sparse matrix of edge weights, entry (u, v) is the
+            weight of edge u->v (symmetric for undirected graphs)
+        nodes: node labels (length n)
+        directed: Whether the graph is directed.
+    """
+
+    def __init__(self, adjacency, nodes, directed=False):
+        self.adjacency = sp.csr_matrix(adjacency)
+        self.nodes = pd.Index(nodes)
+        self.directed = directed
+        self._structure = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self)} nodes, " \
+               f"{self.number_of_edges()} edges, directed={self.directed})"
+
+    @classmethod
+    def from_networkx(cls, G, weight='weight'):
+        """
+        Convert a networkx graph (edges without ``weight`` have weight 1).
+        """
+        nodes = list(G)
+        adjacency = nx.to_scipy_sparse_array(G, nodelist=nodes,
+                                             weight=weight, format='csr')
+
+        return cls(adjacency, nodes, directed=G.is_directed())
+
+    @classmethod
+    def from_edges(cls, sources, targets, weights, nodes, directed=False):
+        """
+        Create a graph from an edge list.
+
+        Args:
+            sources, targets: node ids (positions in ``nodes``) of the edges
+            weights: edge weights
+            nodes: node labels
+            directed: If False, every edge is added in both directions.
+        """
+        n = len(nodes)
+        adjacency = sp.csr_matrix((weights, (sources, targets)), shape=(n, n))
+        if not directed:
+            adjacency = adjacency + adjacency.T - sp.diags(
+                adjacency.diagonal())
+
+        return cls(adjacency, nodes, directed=directed)
+
+    def to_networkx(self, weight='weight'):
+        """
+        The graph as networkx Graph or DiGraph.
+        """
+        G = nx.from_scipy_sparse_array(
+            self.adjacency, create_using=nx.DiGraph if self.directed
+            else nx.Graph, edge_attribute=weight)
+
+        return nx.relabel_nodes(G, dict(enumerate(self.nodes)), copy=False)
+
+    @property
+    def structure(self):
+        """
+        Binary (unweighted) adjacency matrix.
+        """
+        if self._structure is None:
+            structure = self.adjacency.copy()
+            structure.eliminate_zeros()
+            structure.data[:] = 1
+            self._structure = structure
+
+        return self._structure
+
+    def number_of_edges(self):
+        if self.directed:
+            return self.adjacency.nnz
+
+        return (self.adjacency.nnz + np.count_nonzero(
+            self.adjacency.diagonal())) // 2
+
+    def _series(self, values):
+        return pd.Series(values, index=self.nodes)
+
+    def _matrix(self, weighted):
+        return self.adjacency if weighted else self.structure
+
+    def out_degree(self, weighted=False):
+        return self._series(np.asarray(
+            self._matrix(weighted).sum(axis=1)).ravel())
+
+    def in_degree(self, weighted=False):
+        return self._series(np.asarray(
+            self._matrix(weighted).sum(axis=0)).ravel())
+
+    def degree(self, weighted=False):
+        """
+        Degree of every node (as ``networkx.Graph.degree``, self-loops
+        count twice).
+        """
+        if self.directed:
+            return self.out_degree(weighted) + self.in_degree(weighted)
+
+        return self.out_degree(weighted) + \
+            self._series(self._matrix(weighted).diagonal())
+
+    def _degree_centrality(self, degree):
+        if len(self) <= 1:
+            return self._series(np.ones(len(self)))
+
+        return degree * (1.0 / (len(self) - 1))
+
+    def degree_centrality(self):
+        return self._degree_centrality(self.degree())
+
+    def in_degree_centrality(self):
+        return self._degree_centrality(self.in_degree())
+
+    def out_degree_centrality(self):
+        return self._degree_centrality(self.out_degree())
+
+    def eigenvector_centrality(self, max_iter=100, tol=1.0e-6,
+                               weighted=False):
+        """
+        Eigenvector centrality by power iteration with A + I, as
+        ``networkx.eigenvector_centrality``.
+
+        Raises:
+            networkx.PowerIterationFailedConvergence
+        """
+        if len(self) == 0:
+            raise nx.NetworkXPointlessConcept(
+                "cannot compute centrality for the null graph")
+        transposed = self._matrix(weighted).T.tocsr()
+        x = np.full(len(self), 1.0 / len(self))
+        for _ in range(max_iter):
+            xlast = x
+            x = xlast + transposed @ xlast
+            x = x / (np.linalg.norm(x) or 1)
+            if np.abs(x - xlast).sum() < len(self) * tol:
+                return self._series(x)
+
+        raise nx.PowerIterationFailedConvergence(max_iter)
+
+    def closeness_centrality(self, batch_size=None):
+        """
+        Closeness centrality (unweighted), as
+        ``networkx.closeness_centrality``: incoming distances for directed
+        graphs, scaled by the fraction of reachable nodes.
+        """
+        n = len(self)
+        # distances to a node are distances from it in the reversed graph
+        reverse = self.structure.T.tocsr() if self.directed \
+            else self.structure
+        closeness = np.zeros(n)
+        for batch in self._batches(np.arange(n), batch_size):
+            dist = csgraph.shortest_path(reverse, directed=self.directed,
+                                         unweighted=True, indices=batch)
+            reachable = np.isfinite(dist)
+            r = reachable.sum(axis=1)
+            total = np.where(reachable, dist, 0).sum(axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                c = (r - 1) / total * (r - 1) / max(n - 1, 1)
+            closeness[batch] = np.where((total > 0) & (n > 1), c, 0.0)
+
+        return self._series(closeness)
+
+    def _batches(self, sources, batch_size=None):
+        if batch_size is None:
+            # about 32MB per dense (n, batch_size) float matrix
+            batch_size = max(1, 2 ** 22 // max(len(self), 1))
+        for i in range(0, len(sources), batch_size):
+            yield sources[i:i + batch_size]
+
+    def _dependencies(self, sources):
+        """
+        Sum of the (unweighted) Brandes dependencies of all nodes on the
+        shortest paths from ``sources``, computed for all sources at once by
+        breadth-first search with sparse matrix products.
+        """
+        n, b = len(self), len(sources)
+        A = self.structure
+        forward = A.T.tocsr()
+        columns = np.arange(b)
+
+        sigma = np.zeros((n, b))
+        sigma[sources, columns] = 1
+        depth = np.full((n, b), -1, dtype=np.int64)
+        depth[sources, columns] = 0
+        frontier = sigma.copy()
+        level = 0
+        while True:
+            paths = forward @ frontier
+            paths[depth >= 0] = 0
+            reached = paths > 0
+            if not reached.any():
+                break
+            level += 1
+            depth[reached] = level
+            sigma += paths
+            frontier = paths
+
+        delta = np.zeros((n, b))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for d in range(level, 0, -1):
+                t = np.where(depth == d, (1 + delta) / sigma, 0)
+                delta += np.where(depth == d - 1, sigma * (A @ t), 0)
+        delta[sources, columns] = 0
+
+        return delta.sum(axis=1)
+
+    def betweenness_centrality(self, normalized=True, batch_size=None, k=None,
+                               seed=None, n_jobs=None):
+        """
+        Betweenness centrality (unweighted, without endpoints), as
+        ``networkx.betweenness_centrality``.
+
+        Args:
+            normalized: Normalize by 1 / ((n - 1)(n - 2)).
+            batch_size: Number of sources searched at once (default: fit
+                dense (nodes, batch_size) matrices into about 32MB).
+            k: Estimate betweenness from ``k`` randomly sampled sources
+                (None: all nodes are sources). See ``hoeffding_sample_size``
+                for choosing ``k`` for a given error bound.
+            seed: Seed of the random sampling of sources.
+            n_jobs: Number of processes the sources are split across (None
+                or 1: compute in this process).
+        """
+        n = len(self)
+        if k is not None and k < n:
+            rng = np.random.default_rng(seed)
+            sources = np.sort(rng.choice(n, size=k, replace=False))
+        else:
+            k, sources = None, np.arange(n)
+
+        if n_jobs is None or n_jobs == 1:
+            betweenness = _sum_dependencies(self, sources, batch_size)
+        else:
+            chunks = [c for c in np.array_split(sources, n_jobs * 4)
+                      if len(c)]
+            with ProcessPoolExecutor(max_workers=n_jobs,
+                                     initializer=_set_worker_graph,
+                                     initargs=(self,)) as executor:
+                betweenness = sum(
+                    executor.map(_worker_dependencies, chunks,
+                                 [batch_size] * len(chunks)),
+                    np.zeros(n)
+                )
+
+        return self._series(self._rescale(betweenness, normalized, k))
+
+    def _rescale(self, betweenness, normalized, k=None):
+        n = len(self)
+        scale = None
+        if normalized:
+            if n > 2:
+                scale = 1 / ((n - 1) * (n - 2))
+        elif not self.directed:
+            scale = 0.5
+        if scale is not None:
+            if k is not None:
+                scale = scale * n / k
+            betweenness = betweenness * scale
+
+        return betweenness
+
+
+def hoeffding_sample_size(n, epsilon, delta=0.1):
+    """
+    Number of sampled sources for which the estimated normalized
+    betweenness centralities of all ``n`` nodes are within ``epsilon`` of
+    the exact values with probability at least ``1 - delta``. Each source
+    contributes a dependency of at most ``n - 2`` to a node, so Hoeffding's
+    inequality (with a union bound over the nodes) gives
+    ``k = ln(2n / delta) / (2 t^2)`` with ``t = epsilon (n - 1) / n``.
+
+    Returns: k (``n`` if sampling does not save work)
+    """
+    if n <= 2:
+        return n
+    t = epsilon * (n - 1) / n
+
+    return min(n, math.ceil(math.log(2 * n / delta) / (2 * t ** 2)))
+
+
+def hoeffding_error(n, k, delta=0.1):
+    """
+    Error bound (with probability at least ``1 - delta``) of normalized
+    betweenness centralities of ``n`` nodes estimated from ``k`` sampled
+    sources (see ``hoeffding_sample_size``). 0 if all nodes are sources.
+    """
+    if k is None or k >= n or n <= 2:
+        return 0.0
+
+    return n / (n - 1) * math.sqrt(math.log(2 * n / delta) / (2 * k))
+
+
+def _sum_dependencies(graph, sources, batch_size):
+    dependencies = np.zeros(len(graph))
+    for batch in graph._batches(sources, batch_size):
+        dependencies += graph._dependencies(batch)
+
+    return dependencies
+
+
+# graph of a betweenness worker process (see
+# ``SparseGraph.betweenness_centrality``)
+_worker_graph = None
+
+
+def _set_worker_graph(graph):
+    global _worker_graph
+    _worker_graph = graph
+
+
+def _worker_dependencies(sources, batch_size):
+    return _sum_dependencies(_worker_graph, sources, batch_size)
+
+
+class IGraph:
+    """
+    networkx-compatible centralities of an ``igraph.Graph``. Node labels are
+    stored in the vertex attribute ``name``, edge weights in ``weight``.
+
+    Args:
+        graph: igraph.Graph
+    """
+
+    _conversions = weakref.WeakKeyDictionary()
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.nodes = pd.Index(graph.vs['name'] if len(graph.vs) else [])
+        self.directed = graph.is_directed()
+
+    def __len__(self):
+        return self.graph.vcount()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self)} nodes, " \
+               f"{self.graph.ecount()} edges, directed={self.directed})"
+
+    @classmethod
+    def from_networkx(cls, G, weight='weight', cache=True):
+        """
+        Convert a networkx graph (edges without ``weight`` have weight 1).
+        With ``cache``, the conversion is kept as long as ``G`` exists and
+        re-used, so ``G`` must not be changed afterwards.
+        """
+        if cache and G in cls._conversions:
+            return cls._conversions[G]
+
+        index = {n: i for i, n in enumerate(G)}
+        edges = [(index[u], index[v]) for u, v in G.edges()]
+        graph = ig.Graph(n=len(index), edges=edges,
+                         directed=G.is_directed())
+        graph.vs['name'] = list(index)
+        graph.es['weight'] = [d.get(weight, 1) for _, _, d in
+                              G.edges(data=True)]
+        converted = cls(graph)
+        if cache:
+            cls._conversions[G] = converted
+
+        return converted
+
+    def _series(self, values):
+        return pd.Series(np.asarray(values, dtype=float), index=self.nodes)
+
+    def _weights(self, weighted):
+        return 'weight' if weighted else None
+
+    def degree(self, weighted=False):
+        if weighted:
+            return self._series(self.graph.strength(weights='weight'))
+
+        return self._series(self.graph.degree())
+
+    def in_degree(self, weighted=False):
+        return self._series(self.graph.strength(
+            mode='in', weights=self._weights(weighted)))
+
+    def out_degree(self, weighted=False):
+        return self._series(self.graph.strength(
+            mode='out', weights=self._weights(weighted)))
+
+    def _degree_centrality(self, degree):
+        if len(self) <= 1:
+            return self._series(np.ones(len(self)))
+
+        return degree * (1.0 / (len(self) - 1))
+
+    def degree_centrality(self):
+        return self._degree_centrality(self.degree())
+
+    def in_degree_centrality(self):
+        return self._degree_centrality(self.in_degree())
+
+    def out_degree_centrality(self):
+        return self._degree_centrality(self.out_degree())
+
+    def eigenvector_centrality(self, weighted=False):
+        """
+        Eigenvector centrality, scaled to unit length (as networkx).
+        """
+        if len(self) == 0:
+            raise nx.NetworkXPointlessConcept(
+                "cannot compute centrality for the null graph")
+        x = np.asarray(self.graph.eigenvector_centrality(
+            weights=self._weights(weighted)))
+
+        return self._series(x / (np.linalg.norm(x) or 1))
+
+    def closeness_centrality(self, weighted=False):
+        """
+        Closeness centrality over incoming distances, scaled by the fraction
+        of reachable nodes (as networkx).
+        """
+        n = len(self)
+        mode = 'in' if self.directed else 'all'
+        closeness = np.nan_to_num(np.asarray(self.graph.closeness(
+            mode=mode, weights=self._weights(weighted)), dtype=float))
+        reachable = np.asarray(self.graph.neighborhood_size(
+            order=max(n, 1), mode=mode))
+
+        return self._series(closeness * (reachable - 1) / max(n - 1, 1))
+
+    def betweenness_centrality(self, normalized=True, weighted=False):
+        """
+        Betweenness centrality (without endpoints), scaled as networkx.
+        """
+        n = len(self)
+        betweenness = np.asarray(self.graph.betweenness(
+            directed=self.directed, weights=self._weights(weighted)))
+        if normalized:
+            if n > 2:
+                betweenness = betweenness / ((n - 1) * (n - 2))
+                if not self.directed:
+                    # igraph counts every pair of an undirected graph once
+                    betweenness = betweenness * 2
+
+        return self._series(betweenness)
@@ -1,13 +1,12 @@
 import functools
-from itertools import combinations
 import networkx as nx
 import nltk
 import numpy
 import numpy as np
 from functools import reduce
 import pandas as pd
+import scipy.sparse as sp
 from bs4 import BeautifulSoup
-from collections import Counter
 from operator import and_
 from typing import Iterable
 
@@ -140,11 +139,218 @@ def flat(df: pd.DataFrame, columns: str = "community_name"):
     return p
 
 
+ROUNDED_DATE_FREQUENCIES = ['1D', '7D']
+"""
+Frequencies of the rounded post dates that are stored with the posts
+(columns ``rounded_date_<frequency>``).
+"""
+
+THREAD_STRUCTURE_COLUMNS = [
+    'post_position_in_thread',
+    'is_initial_post',
+    'thread_initiator',
+    'thread_start_date',
+    'rounded_date'
+] + [f'rounded_date_{f}' for f in ROUNDED_DATE_FREQUENCIES]
+
+
+def thread_structure(posts, date_column, topic_column, contributor_column,
+                     round_dates_to='7D'):
+    """
+    Calculates structural columns of posts:
+
+    - post_position_in_thread: position of each post in its thread (as int,
+      starting with 1, ordered by date)
+    - is_initial_post: whether the post is the first post of its thread
+    - thread_initiator: contributor of the thread's initial post
+    - thread_start_date: date of the thread's initial post
+    - rounded_date: post date rounded to ``round_dates_to``
+    - rounded_date_<freq>: post date rounded to each of
+      ``ROUNDED_DATE_FREQUENCIES``
+
+    Args:
+        posts: pandas.DataFrame
+        date_column: name of the (datetime) post date column
+        topic_column: name of the thread id column
+        contributor_column: name of the contributor column
+        round_dates_to: frequency of the ``rounded_date`` column
+
+    Returns: pandas.DataFrame with the same index as ``posts``
+
+    """
+    dates = pd.to_datetime(posts[date_column])
+    topics = pd.Series(np.asarray(posts[topic_column], dtype=object))
+
+    # stable sort keeps the order of posts with identical dates
+    order = np.argsort(dates.values, kind='mergesort')
+    sorted_topics = topics.iloc[order]
+    positions = np.empty(len(posts))
+    positions[order] = sorted_topics.groupby(
+        sorted_topics, sort=False).cumcount().values + 1
+    positions = pd.Series(positions, index=posts.index).astype(
+        'int64', errors='ignore')
+
+    # initial posts: first post of each thread in date order
+    initial = order[~sorted_topics.duplicated().values]
+    initial_topics = topics.values[initial]
+    initiators = pd.Series(
+        np.asarray(posts[contributor_column], dtype=object)[initial],
+        index=initial_topics)
+    start_dates = pd.Series(dates.iloc[initial].array,
+                            index=initial_topics)
+
+    structure = pd.DataFrame({
+        'post_position_in_thread': positions,
+        'is_initial_post': positions == 1,
+        'thread_initiator': topics.map(initiators).values,
+        'thread_start_date': topics.map(start_dates).array,
+        'rounded_date': dates.dt.round(freq=round_dates_to)
+    }, index=posts.index)
+    for f in ROUNDED_DATE_FREQUENCIES:
+        structure[f'rounded_date_{f}'] = dates.dt.round(freq=f)
+
+    return structure
+
+
+def naive_timestamp(date):
+    """
+    ``date`` as ``pandas.Timestamp`` without timezone (converted to UTC).
+    """
+    date = pd.Timestamp(date)
+
+    return date.tz_convert(None) if date.tzinfo is not None else date
+
+
+def window_bounds(start, end, freq='MS', size=None, rollback=False,
+                  include_end=False):
+    """
+    Start and end dates of fixed or sliding date windows.
+
+    Args:
+        start: Start of the first window.
+        end: End of the date range.
+        freq: Frequency of window starts (pandas offset alias).
+        size: Length of each window (pandas offset alias, None: ``freq``).
+        rollback: Roll ``start`` back to the previous date on ``freq``
+            (e.g., the beginning of its month).
+        include_end: Whether ``end`` is part of the date range (e.g., the
+            date of the last post) or its exclusive bound.
+
+    Returns: list of (start, end) tuples of ``pandas.Timestamp``
+    """
+    offset = pd.tseries.frequencies.to_offset(freq)
+    size = offset if size is None else pd.tseries.frequencies.to_offset(size)
+    start, end = naive_timestamp(start), naive_timestamp(end)
+    if rollback:
+        start = offset.rollback(start.normalize())
+
+    bounds = []
+    while start < end or (include_end and start == end):
+        w_end = start + size
+        bounds.append((start, w_end if include_end else min(w_end, end)))
+        start = start + offset
+
+    return bounds
+
+
+def _factorize(values):
+    """
+    Integer codes (-1: missing) and unique values of a series. Categorical
+    series are not re-encoded.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.cat.categories
+
+    codes, uniques = pd.factorize(values)
+
+    return codes, pd.Index(uniques)
+
+
+def graph_node_data(G, node_data, node_attributes=None):
+    """
+    Rows of ``node_data`` (indexed by node) for the nodes of ``G``, i.e.,
+    the node attributes of ``G`` as side table. Empty and missing nodes are
+    skipped.
+
+    Args:
+        G: networkx graph
+        node_data: DataFrame indexed by node
+        node_attributes: columns to select (None: all)
+
+    Returns: DataFrame
+    """
+    index = node_data.index
+    data = node_data[index.isin(list(G)) & index.notna() & (index != '')]
+    data = data[~data.index.duplicated(keep='last')]
+
+    return data if node_attributes is None else data[list(node_attributes)]
+
+
+def add_node_attributes(G, node_data, node_attributes):
+    """
+    Attach columns of ``node_data`` (indexed by node) to the nodes of ``G``
+    that are in ``node_data``. Values keep their types (e.g., int, float,
+    Timestamp).
+
+    Args:
+        G: networkx graph
+        node_data: DataFrame indexed by node
+        node_attributes: columns to attach (None or empty: none)
+
+    Returns: G
+    """
+    if node_attributes is None or len(node_attributes) == 0:
+        return G
+
+    data = graph_node_data(G, node_data, node_attributes)
+    columns = [data[a].tolist() for a in data.columns]
+    for n, values in zip(data.index, zip(*columns)):
+        G.nodes[n].update(zip(data.columns, values))
+
+    return G
+
+
+def commenter_edges(link_data, node_col, group_col):
+    """
+    Edges of the commenter graph (see ``create_commenter_graph``) in one
+    vectorized pass: the first node of every group (the thread initiator)
+    is broadcast to the group's rows, and (initiator, node) pairs are
+    counted. Rows with missing nodes or groups are skipped.
+
+    Args:
+        link_data: DataFrame of posts, in thread order (initial posts first)
+        node_col: column of ``link_data`` with the nodes (contributors)
+        group_col: column of ``link_data`` with the groups (topics)
+
+    Returns: DataFrame with columns source, target, weight
+    """
+    nodes, node_index = _factorize(link_data[node_col])
+    groups, _ = _factorize(link_data[group_col])
+    valid = groups >= 0
+    nodes, groups = nodes[valid], groups[valid]
+
+    group_ids, first = np.unique(groups, return_index=True)
+    initiators = nodes[first][np.searchsorted(group_ids, groups)]
+    valid = (initiators >= 0) & (nodes >= 0)
+    pairs, weights = np.unique(
+        initiators[valid].astype(np.int64) * len(node_index) + nodes[valid],
+        return_counts=True
+    )
+
+    return pd.DataFrame({
+        'source': node_index[pairs // max(len(node_index), 1)],
+        'target': node_index[pairs % max(len(node_index), 1)],
+        'weight': weights
+    })
+
+
 def create_commenter_graph(link_data, node_data, node_col, group_col,
                            node_attributes, conntected=True):
     """
     Creates a networkx.DiGraph with nodes=users and directed edges a->b if a
     has replied to an initial post by b. Edge weight is the number of comments.
+    The edges are counted with ``commenter_edges``, node attributes are
+    attached with ``add_node_attributes`` (None: no attributes).
 
     Args:
         link_data:
@@ -158,40 +364,67 @@ def create_commenter_graph(link_data, node_data, node_col, group_col,
 
     """
     G = nx.DiGraph()
-    edges = None
-    for topic, group in link_data.groupby(group_col):
-        authors = group[node_col].tolist()
-        initiator = authors[0]
-        _edges = Counter([(initiator, a) for a in authors])
-        edges = _edges if edges is None else edges + _edges
-
-    try:
-        G.add_edges_from([
-            (n[0], n[1], {"weight": c}) for n, c in edges.items()
-        ])
-    except AttributeError as e:
-        # edges has no attribute 'items'
-        # --> link_data is likely empty --> no information about network
+    edges = commenter_edges(link_data, node_col, group_col)
+    if len(edges) == 0:
+        # link_data is likely empty --> no information about network
         # or network is empty
         print("warning: commenter network without edges")
+    G.add_weighted_edges_from(zip(edges['source'], edges['target'],
+                                  edges['weight'].tolist()))
 
-
-    # add attributes to nodes
-    for n, d in node_data.iterrows():
-        if G.has_node(n) and n != "" and n is not None:
-            for a in node_attributes:
-                value = d[a] if d[a] is not None else np.nan
-                G.nodes[n][a] = str(value)
+    add_node_attributes(G, node_data, node_attributes)
 
     return G
 
 
+def co_contributor_adjacency(link_data, node_col, group_col):
+    """
+    Sparse, symmetric adjacency matrix of the co-contributor graph (see
+    ``create_co_contributor_graph``). The matrix is the product BᵀB of the
+    binary group × node incidence matrix B, without its diagonal, so entry
+    (a, b) is the number of groups both a and b contributed to. Missing and
+    empty nodes are skipped; nodes without co-contributors are not included.
+
+    Args:
+        link_data: DataFrame of posts
+        node_col: column of ``link_data`` with the nodes (contributors)
+        group_col: column of ``link_data`` with the groups (topics)
+
+    Returns: (scipy.sparse.csr_matrix, pandas.Index of nodes)
+    """
+    nodes, node_index = _factorize(link_data[node_col])
+    groups, group_index = _factorize(link_data[group_col])
+    valid = (nodes >= 0) & (groups >= 0)
+    if len(node_index):
+        valid &= ~np.asarray(node_index == '', dtype=bool)[nodes]
+
+    incidence = sp.csr_matrix(
+        (np.ones(valid.sum(), dtype=np.int64),
+         (groups[valid], nodes[valid])),
+        shape=(len(group_index), len(node_index))
+    )
+    # count each node once per group
+    incidence.data[:] = 1
+
+    adjacency = (incidence.T @ incidence).tocsr()
+    # subtract the diagonal (setdiag(0) can leave entries in place if some
+    # are missing, e.g., for empty nodes)
+    adjacency = (adjacency - sp.diags(adjacency.diagonal())).tocsr()
+    adjacency.eliminate_zeros()
+    active = np.flatnonzero(adjacency.getnnz(axis=1))
+
+    return adjacency[active][:, active], node_index[active]
+
+
 def create_co_contributor_graph(link_data, node_data, node_col, group_col,
                                 node_attributes, connected=True):
     """
     Creates a networkx.Graph with nodes=users and edges if two users have
     contributed to the same thread. Edge weights = number of threads where
-    two users co-contributed.
+    two users co-contributed. The edges are derived from the sparse
+    co-contribution matrix (see ``co_contributor_adjacency``), node
+    attributes are attached with ``add_node_attributes`` (None: no
+    attributes).
 
     Args:
         link_data:
@@ -204,30 +437,14 @@ def create_co_contributor_graph(link_data, node_data, node_col, group_col,
     Returns:
 
     """
+    adjacency, nodes = co_contributor_adjacency(link_data, node_col,
+                                                group_col)
+    edges = sp.triu(adjacency, k=1).tocoo()
     G = nx.Graph()
-    for topic, group in link_data.groupby(group_col):
-        authors = group[node_col].tolist()
-        authors = set(authors)
-
-        # create weighted edges
-        for a,b in combinations(authors, 2):
-            if a and b:  # and a in node_data.index and b in node_data.index
-                         # and (connected or connected(a,b,topic)):
-                if not G.has_node(a):
-                    G.add_node(a)
-                if not G.has_node(b):
-                    G.add_node(b)
-                if not G.has_edge(a,b):
-                    G.add_edge(a,b, weight=1)
-                else:
-                    G[a][b]['weight'] += 1
-
-    # add attributes to nodes
-    for n, d in node_data.iterrows():
-        if G.has_node(n) and n!="" and n is not None:
-            for a in node_attributes:
-                value = d[a] if d[a] is not None else np.nan
-                G.nodes[n][a] = str(value)
+    G.add_weighted_edges_from(zip(nodes[edges.row], nodes[edges.col],
+                                  edges.data.tolist()))
+
+    add_node_attributes(G, node_data, node_attributes)
 
     return G
 
@@ -301,7 +518,7 @@ def as_table(func):
 def apply_to_initial_posts(community, new_cols, func):
     """
     Applies ``func`` to initial posts (``community.posts`` where
-    ``post_position_in_thread==1``). Returns DataFrame with ``topic_column``
+    ``is_initial_post``). Returns DataFrame with ``topic_column``
     field as index. Cols in retured df are named according to strings in
     ``new_cols``, values in cols in order of values returned by ``func``.
 
@@ -317,7 +534,7 @@ def apply_to_initial_posts(community, new_cols, func):
 
     # select all posts at position 1 in thread (initial posts)
     initial_posts = community.posts[
-        community.posts['post_position_in_thread'] == 1
+        community.posts['is_initial_post']
     ]
 
     # calculate func on initial posts & concat results with topic_column
@@ -329,7 +546,7 @@ def apply_to_initial_posts(community, new_cols, func):
     ), axis=1)
 
     # return results with topic index
-    return results.groupby(by=community.topic_column).first()
+    return results.groupby(by=community.topic_column, observed=True).first()
 
 
 def where_all(conditions):
@@ -43,9 +43,9 @@ def post_delays_per_topic(community):
     t_col = community.topic_column
     d_col = community.date_column
 
-    first_post = posts.groupby(by=t_col)[d_col].agg('min')
-    last_post = posts.groupby(by=t_col)[d_col].agg('max')
-    second_post = posts.groupby(by=t_col)[d_col].agg(lambda x: x.nsmallest(2).max())
+    first_post = posts.groupby(by=t_col, observed=True)[d_col].agg('min')
+    last_post = posts.groupby(by=t_col, observed=True)[d_col].agg('max')
+    second_post = posts.groupby(by=t_col, observed=True)[d_col].agg(lambda x: x.nsmallest(2).max())
 
     return {
         'delay first last post': (last_post - first_post).dt.days,
@@ -72,9 +72,9 @@ def post_dates_per_topic(community):
     t_col = community.topic_column
     d_col = community.date_column
 
-    first_post = posts.groupby(by=t_col)[d_col].agg('min')
-    last_post = posts.groupby(by=t_col)[d_col].agg('max')
-    second_post = posts.groupby(by=t_col)[d_col].agg(lambda x: x.nsmallest(2).max())
+    first_post = posts.groupby(by=t_col, observed=True)[d_col].agg('min')
+    last_post = posts.groupby(by=t_col, observed=True)[d_col].agg('max')
+    second_post = posts.groupby(by=t_col, observed=True)[d_col].agg(lambda x: x.nsmallest(2).max())
 
     return {
         'first post date': first_post,
@@ -166,7 +166,8 @@ def agg_posts_per_topic(community):
     """
 
     p = community.posts.groupby(
-        by=community.topic_column)[community.date_column].count()
+        by=community.topic_column, observed=True
+    )[community.date_column].count()
 
     return aggregate({
         "posts per topic": p
@@ -216,7 +217,7 @@ def number_of_contributors_per_topic(community):
 
     return {
         'number of contributors': community.posts.groupby(
-            by=community.topic_column
+            by=community.topic_column, observed=True
         )[community.contributor_column].unique().apply(len)
     }
 
@@ -240,7 +241,7 @@ def number_of_posts_per_topic(community):
 
     return {
         'number of posts': community.posts.groupby(
-            by=community.topic_column
+            by=community.topic_column, observed=True
         ).apply(len)
     }
 
@@ -279,7 +280,7 @@ def lorenz(community):
         return x, y
 
     posts_per_user = community.posts.groupby(
-        by=community.contributor_column
+        by=community.contributor_column, observed=True
     )[community.date_column].agg("count").sort_values(ascending=True)
 
     x, y = lrz(posts_per_user.dropna())
@@ -17,12 +17,33 @@ from functools import lru_cache
 from textacy.representations.network import build_similarity_network
 import pandas as pd
 
-cache = lru_cache(maxsize=None)
+from pici.temporal import TemporalDegrees
 
-temporal_network_metrics = {
-    'in_degree_centrality': nx.in_degree_centrality,
-    'out_degree_centrality': nx.out_degree_centrality
+_cached_functions = []
+
+
+def cache(func):
+    cached = lru_cache(maxsize=None)(func)
+    _cached_functions.append(cached)
+    return cached
+
+
+def clear_caches():
+    """
+    Clear the caches of all functions in this module. ``lru_cache`` can not
+    drop single entries, so this removes cached results of all communities.
+    """
+    for func in _cached_functions:
+        func.cache_clear()
+
+temporal_degree_metrics = {
+    'in_degree_centrality': 'in',
+    'out_degree_centrality': 'out'
 }
+"""
+Temporal network metrics that ``_initial_post_author_degree_centrality``
+computes without building graphs (see ``pici.temporal.TemporalDegrees``).
+"""
 
 
 @cache
@@ -46,7 +67,7 @@ def _text_similarity_network(community,
     posts = posts = community.posts
     if only_initial_posts:
         posts = community.posts[
-            community.posts['post_position_in_thread'] == 1
+            community.posts['is_initial_post']
         ]
     texts = posts[text_col].tolist()
     g = build_similarity_network(texts, edge_weighting=similarity_metric)
@@ -118,52 +139,42 @@ def _temporal_text_similarity_dict(community, date,
     return name_to_similarities
 
 
-def _initial_post_author_network_metric(initial_post, community, metric, kind):
+def thread_dates(community):
     """
-    Get a cached network metric for the author of an initial post.
-
-    Args:
-        initial_post:
-        metric:
-        community:
-        thread_date:
-        kind:
-
-    Returns:
-        The value of the metric.
+    Sorted unique dates (``rounded_date``) of the community's initial posts.
     """
-    contributor = initial_post[community.contributor_column]
-    thread_date = initial_post['rounded_date']
-    result = np.nan
-    metrics = _cached_temporal_network_metric(
-        metric, community, thread_date, kind=kind)
-    try:
-        result = metrics[contributor]
-    except KeyError:
-        # contributor was not found in the network ==> metric undefined
-        print(f"contributor {contributor} not found in {metric} of {kind} "
-              f"network of community '{community}' on {thread_date}.")
+    dates = community.posts.loc[community.posts['is_initial_post'],
+                                'rounded_date']
 
-    return result
+    return pd.DatetimeIndex(dates.dropna().unique()).sort_values()
 
 
 @cache
-def _cached_temporal_network_metric(metric, community, thread_date, kind):
-    results = None
-    graph = community.temporal_graph(
-        start=None, end=thread_date, kind=kind
+def _temporal_degrees(community, kind):
+    return TemporalDegrees.from_community(community, kind)
+
+
+def _initial_post_author_degree_centrality(community, metric, kind):
+    """
+    Degree centrality (see ``temporal_degree_metrics``) of the author of
+    every initial post in the ``kind`` network at the time of thread
+    creation (``rounded_date``), computed for all initial posts at once
+    from the temporal degrees of the network.
+
+    Returns: pandas.Series indexed by topic (NaN if the author is not part
+    of the network at that time)
+    """
+    initial_posts = community.posts[community.posts['is_initial_post']]
+    centrality = _temporal_degrees(community, kind).centrality(
+        initial_posts[community.contributor_column],
+        initial_posts['rounded_date'],
+        direction=temporal_degree_metrics[metric]
     )
-    if graph is not None:
-        try:
-            metric_func = temporal_network_metrics[metric]
-            results = metric_func(graph)
-        except KeyError:
-            raise Exception(f"The network metric {metric} is not defined.")
-    else:
-        print(f"warning: could not calculate {metric} for "
-              f"{kind} graph (community '{community}' on {thread_date})")
+    results = initial_posts[[community.topic_column]].assign(
+        _centrality=centrality)
 
-    return results
+    return results.groupby(by=community.topic_column,
+                           observed=True).first()['_centrality']
 
 
 @cache
@@ -182,7 +193,7 @@ def _threads_by_contributor(community, contributor, date_limit=None):
     """
     tfilter = (
             (community.posts[community.contributor_column] == contributor) &
-            (community.posts['post_position_in_thread'] == 1)
+            (community.posts['is_initial_post'])
     )
     if date_limit is not None:
         tfilter = (tfilter & community.posts['rounded_date'] < date_limit)
@@ -207,7 +218,7 @@ def _comments_by_contributor(community, contributor, date_limit=None):
     """
     cfilter = (
             (community.posts[community.contributor_column] == contributor) &
-            (community.posts['post_position_in_thread'] > 1)
+            (~community.posts['is_initial_post'])
     )
     if date_limit is not None:
         cfilter = cfilter & (community.posts['rounded_date'] < date_limit)
@@ -241,8 +252,9 @@ def _replies_to_own_topics(community, contributor, date_limit=None):
                               date_limit if date_limit is not None else True
         replies = community.posts[in_threads_by_contributor &
                                   posted_before_limit]
-        num_replies = replies.groupby(by=community.topic_column).apply(
-            lambda g: len(g) - 1).tolist()
+        num_replies = replies.groupby(
+            by=community.topic_column, observed=True
+        ).apply(lambda g: len(g) - 1).tolist()
 
     # contributor is nan
     else:
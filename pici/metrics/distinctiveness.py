@@ -44,7 +44,7 @@ def initial_post_text_distance(community,
 
     # select all posts at position 1 in thread (initial posts)
     initial_posts = community.posts[
-        community.posts['post_position_in_thread'] == 1
+        community.posts['is_initial_post']
     ]
 
     # calculate each post-text's distance to previous initial posts
@@ -53,7 +53,8 @@ def initial_post_text_distance(community,
     initial_posts['_distance_min'] = initial_posts.apply(distance,
                                          agg_method='min', axis=1)
 
-    results = initial_posts.groupby(by=community.topic_column).first()
+    results = initial_posts.groupby(
+        by=community.topic_column, observed=True).first()
 
     return {
         f'distinctiveness: mean text-distance of initial post to previous '
@@ -66,11 +67,11 @@ def initial_post_text_distance(community,
 @topics_metric
 def basic_text_based_elaboration(community):
     posts = community.posts.groupby(
-        by=community.topic_column)
-    initial_post = community.posts[community.posts['post_position_in_thread']
-                                   == 1].groupby(by=community.topic_column)
-    feedback = community.posts[community.posts['post_position_in_thread']
-                                   > 1].groupby(by=community.topic_column)
+        by=community.topic_column, observed=True)
+    initial_post = community.posts[community.posts['is_initial_post']].groupby(
+        by=community.topic_column, observed=True)
+    feedback = community.posts[~community.posts['is_initial_post']].groupby(
+        by=community.topic_column, observed=True)
 
     gen = lambda t, c: generate_indicator_results(posts, initial_post,
                                                   feedback, t, c)
@@ -1,10 +1,9 @@
 import numpy as np
 import pandas as pd
 
-from pici.helpers import apply_to_initial_posts
 from pici.metrics.cached_metrics import _threads_by_contributor, \
     _comments_by_contributor, _date_of_first_post, \
-    _initial_post_author_network_metric
+    _initial_post_author_degree_centrality
 from pici.reporting import topics_metric
 
 
@@ -27,7 +26,7 @@ def initiator_experience_by_past_contributions(
 
     # select all posts at position 1 in thread (initial posts)
     initial_posts = community.posts[
-        community.posts['post_position_in_thread'] == 1
+        community.posts['is_initial_post']
     ]
     # count number of all threads that were initiated by the author of each
     # initial post
@@ -68,7 +67,8 @@ def initiator_experience_by_past_contributions(
         'num_comments'].divide(initial_posts['days_since_first_post'])
 
     # group initial posts by thread to generate required index
-    results = initial_posts.groupby(by=community.topic_column).first()
+    results = initial_posts.groupby(
+        by=community.topic_column, observed=True).first()
 
     return {
         'initiator experience: number of past initial posts': results[
@@ -98,15 +98,8 @@ def initiator_experience_by_commenter_network_out_deg_centrality(community):
 
     """
 
-    results = apply_to_initial_posts(community, ['_centrality'],
-        lambda p: _initial_post_author_network_metric(
-            p, community,
-            metric='out_degree_centrality',
-            kind='commenter'
-        )
-    )
-
     return {
         'initiator experience: commenter network out-degree centrality':
-            results['_centrality']
+            _initial_post_author_degree_centrality(
+                community, metric='out_degree_centrality', kind='commenter')
     }
\ No newline at end of file
@@ -22,7 +22,7 @@ def initiator_helpfulness_by_contribution_regularity(community,
     """
     # select all posts at position 1 in thread (initial posts)
     initial_posts = community.posts[
-        community.posts['post_position_in_thread'] == 1
+        community.posts['is_initial_post']
     ]
     # calculate the contribution regularity for the initial contributor
     initial_posts['_regularity'] = initial_posts.apply(
@@ -33,7 +33,8 @@ def initiator_helpfulness_by_contribution_regularity(community,
             end=p['rounded_date']
         ), axis=1
     )
-    results = initial_posts.groupby(by=community.topic_column).first()
+    results = initial_posts.groupby(
+        by=community.topic_column, observed=True).first()
 
     return {
         f'initiator helpfulness: past ({lookback_days} days) contribution '
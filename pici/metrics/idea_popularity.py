@@ -1,4 +1,6 @@
-from pici.helpers import apply_to_initial_posts
+import numpy as np
+import pandas as pd
+
 from pici.reporting import topics_metric
 
 
@@ -12,18 +14,22 @@ def idea_popularity_by_number_of_unique_users_commenting(community):
     Returns:
 
     """
-    def _metric(initial_post):
-        tposts = community.posts[
-            community.posts[community.topic_column] ==
-            initial_post[community.topic_column]
-        ]
-        num_commenters = tposts[community.contributor_column].nunique() -1
-        num_comments = len(tposts.index) -1
-
-        return num_comments, num_commenters
-
-    results = apply_to_initial_posts(
-        community, ['num_comments', 'num_commenters'], _metric)
+    threads = community.threads
+    num_comments = threads.sizes - 1
+    num_commenters = threads.nunique(community.contributor_column) - 1
+
+    # threads that have an initial post
+    codes = np.unique(community.topic_codes[
+        community.posts['is_initial_post'].values])
+    codes = codes[codes >= 0]
+    index = pd.CategoricalIndex(
+        pd.Categorical.from_codes(codes, categories=threads.topics),
+        name=community.topic_column
+    )
+    results = pd.DataFrame({
+        'num_comments': num_comments[codes],
+        'num_commenters': num_commenters[codes]
+    }, index=index)
 
     return {
         'idea popularity: number of unique commenters': results[
@@ -9,18 +9,109 @@ By level of observation:
 - [contributor_centralities][pici.metrics.network.contributor_centralities]
 - [contributor_communities][pici.metrics.network.contributor_communities]
 """
-from pici.helpers import apply_to_initial_posts
+from functools import partial
+
+from pici.graphs import IGraph, hoeffding_error, hoeffding_sample_size
+from pici.metrics.cached_metrics import _temporal_degrees, thread_dates
 from pici.reporting import contributors_metric, topics_metric
+from pici.temporal import lookup_snapshot_metric, snapshot_metrics
 import networkx as nx
-import numpy as np
-from networkx.algorithms.centrality import *
+import pandas as pd
 from cdlib import algorithms as cd
 import igraph as ig
 import leidenalg
 
 
+GRAPH_BACKENDS = ['networkx', 'sparse', 'igraph']
+"""
+Graph representations the centrality metrics can run on: ``networkx``
+graphs (``Community.co_contributor_graph``, ``commenter_graph``),
+``pici.graphs.SparseGraph`` (``Community.sparse_graph``) or igraph
+conversions of the networkx graphs (``pici.graphs.IGraph``, converted once
+per graph).
+"""
+
+
+def _sample_size(n, k=None, epsilon=None, delta=0.1):
+    """
+    Number of sampled sources for betweenness of a graph with ``n`` nodes:
+    ``k``, or the sample size for error ``epsilon`` (see
+    ``pici.graphs.hoeffding_sample_size``). None if all nodes are sources.
+    """
+    k = hoeffding_sample_size(n, epsilon, delta) if epsilon is not None \
+        else k
+
+    return None if k is None or k >= n else k
+
+
+def _graph(community, kind, backend):
+    if backend == 'networkx':
+        return getattr(community, f'{kind}_graph')
+    elif backend == 'sparse':
+        return community.sparse_graph(kind)
+    elif backend == 'igraph':
+        return IGraph.from_networkx(getattr(community, f'{kind}_graph'))
+
+    raise ValueError(f"Unknown graph backend {backend}, use one of "
+                     f"{GRAPH_BACKENDS}.")
+
+
+def _centrality(G, name, backend):
+    """
+    Centrality ``name`` (e.g., 'betweenness_centrality') of all nodes of
+    ``G``, using the ``networkx`` function or the graph's method of the same
+    name.
+    """
+    if backend == 'networkx':
+        return getattr(nx, name)(G)
+
+    return getattr(G, name)()
+
+
+def _betweenness(G, backend, column, epsilon=None, delta=0.1, n_jobs=None,
+                 seed=None):
+    """
+    Betweenness centrality of ``G`` as metric columns, computed by
+    ``backend``.
+
+    With ``epsilon``, betweenness is estimated from as many sampled sources
+    as needed for an error of at most ``epsilon`` with probability
+    ``1 - delta`` (see ``pici.graphs.hoeffding_sample_size``), and the
+    error bound achieved is added as column "``column`` (error bound)".
+    Sampling is available with the 'networkx' and 'sparse' backends,
+    splitting the sources across ``n_jobs`` processes only with 'sparse'.
+
+    Raises:
+        ValueError: if the backend does not support ``epsilon`` or
+            ``n_jobs``.
+
+    Returns: dict of column: values
+    """
+    if n_jobs is not None and backend != 'sparse':
+        raise ValueError(f"Parallel betweenness (n_jobs) is not available "
+                         f"with the {backend} backend, use 'sparse'.")
+    if epsilon is not None and backend == 'igraph':
+        raise ValueError("Sampled betweenness (epsilon) is not available "
+                         "with the igraph backend.")
+    if epsilon is None and n_jobs is None:
+        return {column: _centrality(G, 'betweenness_centrality', backend)}
+
+    n = len(G)
+    k = None if epsilon is None else _sample_size(n, epsilon=epsilon,
+                                                  delta=delta)
+    if backend == 'sparse':
+        results = {column: G.betweenness_centrality(k=k, seed=seed,
+                                                    n_jobs=n_jobs)}
+    else:
+        results = {column: nx.betweenness_centrality(G, k=k, seed=seed)}
+    if epsilon is not None:
+        results[f'{column} (error bound)'] = hoeffding_error(n, k, delta)
+
+    return results
+
+
 @contributors_metric
-def co_contributor_degree(community):
+def co_contributor_degree(community, backend='networkx'):
     """
     Number of contributors each contributor has co-authored with in a thread.
 
@@ -30,46 +121,87 @@ def co_contributor_degree(community):
         document
     Args:
         community (pici.Community):
+        backend: 'networkx', 'sparse' or 'igraph' (see ``GRAPH_BACKENDS``)
 
     Returns:
 
     """
+    G = _graph(community, 'co_contributor', backend)
+
     return {
-        'degree': dict(community.co_contributor_graph.degree())
+        'degree': dict(G.degree()) if backend == 'networkx' else G.degree()
     }
 
 
 @contributors_metric
-def commenter_centralities(community):
-    G = community.commenter_graph
+def commenter_centralities(community, backend='networkx', epsilon=None,
+                           delta=0.1, n_jobs=None, seed=None):
+    """
+    In-degree, out-degree and betweenness centrality of contributors in the
+    commenter network.
+
+    Args:
+        community (pici.Community):
+        backend: 'networkx', 'sparse' or 'igraph' (see ``GRAPH_BACKENDS``)
+        epsilon: Estimate betweenness from sampled sources with this
+            maximum error (None: exact, not available with 'igraph').
+        delta: Probability that the error of estimated betweenness exceeds
+            ``epsilon``.
+        n_jobs: Number of processes to compute betweenness in (only with
+            backend 'sparse').
+        seed: Seed of the sampling of sources.
+
+    Returns:
+
+    """
+    G = _graph(community, 'commenter', backend)
 
     return {
-        'commenter in-degree centrality': in_degree_centrality(G),
-        'commenter out-degree centrality': out_degree_centrality(G),
-        'commenter betweenness centrality': betweenness_centrality(G)
+        'commenter in-degree centrality':
+            _centrality(G, 'in_degree_centrality', backend),
+        'commenter out-degree centrality':
+            _centrality(G, 'out_degree_centrality', backend),
+        **_betweenness(G, backend, 'commenter betweenness centrality',
+                       epsilon, delta, n_jobs, seed)
     }
 
 
 @contributors_metric
-def co_contributor_centralities(community):
+def co_contributor_centralities(community, backend='networkx', epsilon=None,
+                                delta=0.1, n_jobs=None, seed=None):
     """
     Contributor centralities.
 
     Includes degree centrality, betweenness centrality, and eigenvector centrality.
-    Using ``networkx`` implementation.
+    Using ``networkx`` implementation, sparse matrix operations with
+    ``backend='sparse'`` or ``igraph`` with ``backend='igraph'``.
+
+    Betweenness can be estimated from sampled sources (``epsilon``), then
+    its error bound is reported as additional column, and computed in
+    parallel (``n_jobs``, with backend 'sparse').
 
     Args:
         community (pici.Community):
+        backend: 'networkx', 'sparse' or 'igraph' (see ``GRAPH_BACKENDS``)
+        epsilon: Estimate betweenness from sampled sources with this
+            maximum error (None: exact, not available with 'igraph').
+        delta: Probability that the error of estimated betweenness exceeds
+            ``epsilon``.
+        n_jobs: Number of processes to compute betweenness in (only with
+            backend 'sparse').
+        seed: Seed of the sampling of sources.
 
     Returns:
 
     """
-    G = community.co_contributor_graph
+    G = _graph(community, 'co_contributor', backend)
 
     return {
-        'degree_centrality': degree_centrality(G),
-        'betweenness_centrality': betweenness_centrality(G),
-        'eigenvector_centrality': eigenvector_centrality(G)
+        'degree_centrality': _centrality(G, 'degree_centrality', backend),
+        **_betweenness(G, backend, 'betweenness_centrality', epsilon, delta,
+                       n_jobs, seed),
+        'eigenvector_centrality':
+            _centrality(G, 'eigenvector_centrality', backend)
     }
 
 
@@ -127,63 +259,104 @@ def co_contributor_communities(community, leiden_lib='cdlib'):
     }
 
 
+def _snapshot_betweenness(graph, k=None, epsilon=None, delta=0.1, seed=None):
+    return nx.betweenness_centrality(
+        graph, k=_sample_size(len(graph), k, epsilon, delta),
+        normalized=True, weight='weight', seed=seed)
+
+
+def _snapshot_igraph_betweenness(graph):
+    # the snapshot changes, so its conversion is not cached
+    return IGraph.from_networkx(graph, cache=False).betweenness_centrality(
+        weighted=True)
+
+
+def _snapshot_igraph_closeness(graph):
+    return IGraph.from_networkx(graph, cache=False).closeness_centrality()
+
+
 @topics_metric
-def initiator_centrality_in_co_contributor_network(community, k=None):
+def initiator_centrality_in_co_contributor_network(community, k=None,
+                                                   backend='networkx',
+                                                   epsilon=None, delta=0.1,
+                                                   seed=None, n_jobs=None):
     """
-    TODO: implement using _initial_post_author_network_metric()
+    Centralities are computed on snapshots of the co-contributor graph at
+    every thread date (see ``pici.temporal.snapshot_metrics``), in
+    ``n_jobs`` processes.
+
+    Betweenness can be estimated from ``k`` sampled sources per graph
+    snapshot, or from as many as needed for an error of at most ``epsilon``
+    (with probability ``1 - delta``, see
+    ``pici.graphs.hoeffding_sample_size``). When sampling, the error bound
+    of every thread's betweenness is reported as additional column.
+
     Args:
         community:
-        k:
+        k: Number of sampled sources (None: exact betweenness).
+        backend: 'networkx' or 'igraph' (exact betweenness only, ``k`` and
+            ``epsilon`` must be None)
+        epsilon: Maximum error of estimated betweenness (overrides ``k``).
+        delta: Probability that the error exceeds ``epsilon``.
+        seed: Seed of the sampling of sources.
+        n_jobs: Number of processes to compute snapshots in.
 
     Returns:
 
     """
-
-    _cache = dict()
-
-    def centralities(initial_post):
-        contributor = initial_post[community.contributor_column]
-        thread_date = initial_post['rounded_date']
-        _centralities = dict()
-
-        if thread_date not in _cache.keys():
-            graph = community.temporal_graph(
-                start=None, end=thread_date, kind='co_contributor'
-            )
-            if graph is not None:
-                _cache[thread_date] = {}
-                # betweenness centrality
-                betw = nx.betweenness_centrality(graph, k=k,
-                                                 normalized=True,
-                                                 weight='weight')
-                _cache[thread_date]['betweenness'] = betw
-
-                # closeness centrality
-                close = nx.closeness_centrality(graph)
-                _cache[thread_date]['closeness'] = close
-
-        try:
-            _centralities['betweenness'] = _cache[thread_date][
-                'betweenness'][contributor]
-        except KeyError:
-            _centralities['betweenness'] = np.nan
-        try:
-            _centralities['closeness'] = _cache[thread_date][
-                'closeness'][contributor]
-        except KeyError:
-            _centralities['closeness'] = np.nan
-
-        return (_centralities['betweenness'],
-                _centralities['closeness'])
-
-    results = apply_to_initial_posts(community,
-        new_cols=['betweenness','closeness'],
-        func=centralities
-    )
-
-    return {
+    if backend not in ('networkx', 'igraph'):
+        raise ValueError(f"Unknown graph backend {backend}, use 'networkx' "
+                         f"or 'igraph'.")
+    sampled = k is not None or epsilon is not None
+    if backend == 'igraph' and sampled:
+        raise ValueError("Sampled betweenness (k, epsilon) is not available "
+                         "with the igraph backend.")
+
+    if backend == 'igraph':
+        metrics = {
+            'betweenness': _snapshot_igraph_betweenness,
+            'closeness': _snapshot_igraph_closeness
+        }
+    else:
+        metrics = {
+            'betweenness': partial(_snapshot_betweenness, k=k,
+                                   epsilon=epsilon, delta=delta, seed=seed),
+            'closeness': nx.closeness_centrality
+        }
+
+    table = snapshot_metrics(
+        community,
+        [('co_contributor', date, m)
+         for date in thread_dates(community) for m in metrics],
+        metrics=metrics, n_jobs=n_jobs)
+
+    initial_posts = community.posts[community.posts['is_initial_post']]
+    results = initial_posts[[community.topic_column]].assign(**{
+        m: lookup_snapshot_metric(table, ('co_contributor', m),
+                                  initial_posts['rounded_date'],
+                                  initial_posts[community.contributor_column])
+        for m in metrics
+    }).groupby(by=community.topic_column, observed=True).first()
+
+    metrics = {
         'initiator position: betweenness centrality in co-contributor network':
             results['betweenness'],
         'initiator position: closeness centrality in co-contributor network':
             results['closeness']
     }
+    if sampled:
+        # one bound per snapshot, from the snapshot's number of nodes
+        dates = thread_dates(community)
+        degrees = _temporal_degrees(community, 'co_contributor')
+        errors = pd.Series([
+            hoeffding_error(n, _sample_size(n, k, epsilon, delta), delta)
+            for n in degrees.number_of_nodes(degrees.stops(dates))
+        ], index=dates, dtype=float)
+        metrics['initiator position: betweenness centrality in '
+                'co-contributor network (error bound)'] = \
+            initial_posts[[community.topic_column]].assign(
+                error=initial_posts['rounded_date'].map(errors)
+            ).groupby(by=community.topic_column, observed=True).first()[
+                'error']
+
+    return metrics
@@ -5,11 +5,11 @@ from pici.reporting import topics_metric
 @topics_metric
 def posts_sentiments(community):
     posts = community.posts.groupby(
-        by=community.topic_column)
-    initial_post = community.posts[community.posts['post_position_in_thread']
-                                   == 1].groupby(by=community.topic_column)
-    feedback = community.posts[community.posts['post_position_in_thread']
-                                   > 1].groupby(by=community.topic_column)
+        by=community.topic_column, observed=True)
+    initial_post = community.posts[community.posts['is_initial_post']].groupby(
+        by=community.topic_column, observed=True)
+    feedback = community.posts[~community.posts['is_initial_post']].groupby(
+        by=community.topic_column, observed=True)
 
     gen = lambda t, c: generate_indicator_results(posts, initial_post,
                                                   feedback, t, c)
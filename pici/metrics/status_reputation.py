@@ -1,6 +1,6 @@
-from pici.helpers import apply_to_initial_posts, aggregate
-from pici.metrics.cached_metrics import _initial_post_author_network_metric, \
-    _replies_to_own_topics
+from pici.helpers import aggregate
+from pici.metrics.cached_metrics import \
+    _initial_post_author_degree_centrality, _replies_to_own_topics
 from pici.reporting import topics_metric
 
 
@@ -19,17 +19,10 @@ def initiator_prestige_by_commenter_network_in_deg_centrality(community):
 
     """
 
-    results = apply_to_initial_posts(community, ['_centrality'],
-        lambda p: _initial_post_author_network_metric(
-            p, community,
-            metric='in_degree_centrality',
-            kind='commenter'
-        )
-    )
-
     return {
         'initiator prestige: commenter network in-degree centrality':
-            results['_centrality']
+            _initial_post_author_degree_centrality(
+                community, metric='in_degree_centrality', kind='commenter')
     }
 
 
@@ -49,7 +42,7 @@ def number_of_replies_to_topics_initiated_by_thread_initiator(
 
     """
     initial_posts = community.posts[
-        community.posts['post_position_in_thread'] == 1
+        community.posts['is_initial_post']
     ]
     initial_posts['_r'] = initial_posts.apply(
         lambda p: _replies_to_own_topics(
@@ -60,7 +53,7 @@ def number_of_replies_to_topics_initiated_by_thread_initiator(
         axis=1
     )
     reply_counts = initial_posts.groupby(
-        by=community.topic_column
+        by=community.topic_column, observed=True
     ).first()['_r']
 
     return aggregate({
@@ -5,6 +5,8 @@
 from typing import overload
 import pandas as pd
 from collections import ChainMap
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from sklearn.ensemble import RandomForestClassifier
 from boruta import BorutaPy
 from sklearn.multiclass import OneVsRestClassifier
@@ -17,11 +19,152 @@ from pici.reporting import report
 from pici.datatypes import CommunityDataLevel, MetricReturnType
 from pici.registries import MetricRegistry, ReportRegistry
 from pici.labelling import LabelCollection
+from pici.metrics.cached_metrics import clear_caches
+from pici.helpers import window_bounds, naive_timestamp
 
 import logging
 LOGGER = logging.getLogger(__name__)
 
 
+class Communities(Mapping):
+    """
+    Mapping of community names to communities that creates each community
+    on first access and keeps it afterwards. Metrics and preprocessors that
+    are added before a community is loaded are added to it when it is
+    created. Communities that failed to load in ``load_all`` are recorded
+    in ``load_errors`` and left out of iteration until they are loaded
+    successfully (their factories are kept, so loading can be retried).
+
+    Examples:
+        === "Python"
+        ``` py
+        communities = Communities(Pici.DEFAULT_COMMUNITIES, cache_dir='cache')
+        osm = communities['OpenStreetMap']  # only loads OpenStreetMap
+        communities.unload('OpenStreetMap')
+        ```
+    """
+
+    def __init__(self, factories, cache_dir="cache", cache_nrows=None,
+                 start=None, end=None, cache_format=None, cache_columns=None):
+        """
+        Args:
+            factories (dict of str: pici.CommunityFactory): Dictionary of communities.
+            cache_dir, cache_nrows, start, end, cache_format, cache_columns: see ``pici.Pici``.
+        """
+        self._factories = dict(factories)
+        self._factory_args = (cache_dir, cache_nrows, cache_format,
+                              cache_columns)
+        self._start = start
+        self._end = end
+        self._loaded = {}
+        self._metrics = []
+        self._preprocessors = []
+        self.load_errors = {}
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            if name not in self._factories:
+                raise KeyError(name)
+            self._loaded[name] = self._setup(self._create(name))
+            self.load_errors.pop(name, None)
+
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter([c for c in self._factories if c not in self.load_errors])
+
+    def __len__(self):
+        return len(self._factories) - len(self.load_errors)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(" \
+               f"loaded={self.loaded}, " \
+               f"not_loaded={[c for c in self if c not in self._loaded]})"
+
+    @property
+    def loaded(self):
+        """
+        Names of the communities that are currently loaded.
+        """
+        return list(self._loaded.keys())
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def _create(self, name):
+        return self._factories[name](*self._factory_args).create_community(
+            name=name, start=self._start, end=self._end)
+
+    def _setup(self, community):
+        for metric in self._metrics:
+            community.metrics.add(metric)
+        for preprocessor in self._preprocessors:
+            community.preprocessors.add(preprocessor)
+
+        return community
+
+    def load_all(self, n_jobs=None):
+        """
+        Create all communities that are not loaded yet (including ones that
+        failed to load before), either sequentially or using a pool of
+        ``n_jobs`` threads. A community that fails to load is logged and
+        recorded in ``load_errors`` instead of aborting the others.
+
+        Args:
+            n_jobs (int): Number of communities to load concurrently (None
+                (default) or 1: load one after another).
+        """
+        pending = [c for c in self._factories if c not in self._loaded]
+
+        if n_jobs is None or n_jobs == 1:
+            for c in pending:
+                self._load(c, lambda: self._create(c))
+            return self
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            futures = {c: executor.submit(self._create, c) for c in pending}
+            for c, future in futures.items():
+                self._load(c, future.result)
+
+        return self
+
+    def _load(self, name, create):
+        try:
+            community = create()
+        except Exception as e:
+            LOGGER.error(f"Could not load community {name}: {e}")
+            self.load_errors[name] = e
+            return
+        self._loaded[name] = self._setup(community)
+        self.load_errors.pop(name, None)
+
+    def unload(self, name):
+        """
+        Unload a community, dropping its data, graphs and cached metric
+        results. The community is loaded again on next access.
+
+        Note that the results of the cached functions in
+        ``pici.metrics.cached_metrics`` are cleared for all communities.
+
+        Args:
+            name (str): Name of the community
+        """
+        community = self._loaded.pop(name, None)
+        if community is not None:
+            community.release()
+            clear_caches()
+
+    def add_metric(self, metric):
+        self._metrics.append(metric)
+        for c in self._loaded.values():
+            c.metrics.add(metric)
+
+    def add_preprocessor(self, preprocessor):
+        self._preprocessors.append(preprocessor)
+        for c in self._loaded.values():
+            c.preprocessors.add(preprocessor)
+
+
 class Pici:
     """
     TODO:
@@ -52,7 +195,8 @@ class Pici:
     }
 
     def __init__(self, communities=None, labels=[], cache_dir="cache",
-                 cache_nrows=None, start=None, end=None):
+                 cache_nrows=None, start=None, end=None, cache_format=None,
+                 cache_columns=None, n_jobs=None, lazy=False):
         """
         Loads communities.
 
@@ -67,24 +211,77 @@ class Pici:
             cache_nrows (int): Number of rows to load from cache (None (default): load all rows).
             start (str): Start-date for filtering posts. String format must be valid input for ``pandas.Timestamp``.
             end (str): End-date for filtering posts. String format must be valid input for ``pandas.Timestamp``.
+            cache_format (str): Format of new cache files, 'parquet' or 'csv' (None (default): 'parquet' if
+                ``pyarrow`` is installed). Existing cache files are read in any format.
+            cache_columns (dict of str:list): Columns to load from the cached tables (e.g. ``{'posts': [...]}``),
+                in addition to the columns each community requires (None (default): load all columns).
+            n_jobs (int): Number of communities to load concurrently (None (default) or 1: load one after
+                another). A community that fails to load is logged and recorded in ``load_errors`` instead
+                of aborting the others.
+            lazy (bool): Create each community on first access to ``communities`` instead of loading all
+                communities right away (default: False).
         """
         if communities is None:
             communities = self.DEFAULT_COMMUNITIES
-        self.communities = {
-            c: f(cache_dir, cache_nrows).create_community(name=c, start=start, end=end)
-            for c, f in communities.items()
-        }
+        self.communities = Communities(
+            communities, cache_dir=cache_dir, cache_nrows=cache_nrows,
+            start=start, end=end, cache_format=cache_format,
+            cache_columns=cache_columns
+        )
+        self.load_errors = self.communities.load_errors
+        if not lazy:
+            self.communities.load_all(n_jobs)
         self.reports = ReportRegistry(self)
         self.labels = LabelCollection(labels)
         self.pipelines = Pipelines(self)
 
+    def unload(self, name):
+        """
+        Unload a community to free its data, graphs and cached metrics
+        (see ``Communities.unload``).
+        """
+        self.communities.unload(name)
+
+    def windows(self, freq='MS', size=None, start=None, end=None):
+        """
+        Iterate over fixed or sliding date windows of all communities (see
+        ``Community.windows``). Windows are views that slice the loaded
+        (preprocessed) posts and share the temporal graph cache of the
+        communities, so no data is re-loaded per window. Thread structure
+        and metrics are computed per window, with the same results as a
+        ``Pici`` loaded with the window's ``start`` and ``end``.
+
+        Args:
+            freq: Frequency of window starts as pandas offset alias, e.g.,
+                'MS' (month start) or 'QS' (quarter start).
+            size: Length of each window (None (default): ``freq``).
+            start: Start of the first window (None: first post of all
+                communities, rolled back to ``freq``).
+            end: End of the last window (None: after the last post).
+
+        Yields: tuples of (window start, dict of str: pici.Community)
+        """
+        communities = dict(self.communities)
+        dates = [
+            naive_timestamp(d)
+            for c in communities.values()
+            for d in c.posts[c.date_column].agg(['min', 'max'])
+        ]
+        for w_start, w_end in window_bounds(
+                min(dates) if start is None else start,
+                max(dates) if end is None else end,
+                freq=freq, size=size, rollback=start is None,
+                include_end=end is None):
+            yield w_start, {
+                name: c.date_range(w_start, w_end)
+                for name, c in communities.items()
+            }
+
     def add_metric(self, metric):
-        for c in self.communities.values():
-            c.metrics.add(metric)
+        self.communities.add_metric(metric)
 
     def add_preprocessor(self, preprocessor):
-        for c in self.communities.values():
-            c.preprocessors.add(preprocessor)
+        self.communities.add_preprocessor(preprocessor)
 
     @overload
     def add_report(self, new_report):
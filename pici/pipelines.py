@@ -153,7 +153,10 @@ class Pipelines:
 
         for dlevel, cols in result_dfs.items():
             preprocessed_df = pd.concat(cols, axis=1)
-            old_df = getattr(community, dlevel.value).copy(deep=True)
+            # preprocessed columns replace existing columns with equal names
+            old_df = getattr(community, dlevel.value).drop(
+                columns=preprocessed_df.columns, errors='ignore'
+            ).copy(deep=True)
             new_df = pd.concat([old_df, preprocessed_df], axis=1)
             setattr(community, f"_{dlevel.value}", new_df)
 
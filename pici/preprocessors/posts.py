@@ -21,10 +21,13 @@ nlp = spacy.load("en_core_web_sm")
 def post_position_in_thread(community):
     """
     Adds each post's position in thread (as int, starting with 1) to
-    ``community.posts``.
+    ``community.posts``. Positions stored with the cache are reused.
     """
+    if 'post_position_in_thread' in community.posts.columns:
+        return community.posts['post_position_in_thread']
+
     p = community.posts.sort_values(by=[community.date_column])
-    positions = p.groupby(community.topic_column).cumcount() + 1
+    positions = p.groupby(community.topic_column, observed=True).cumcount() + 1
 
     return positions
 
@@ -43,7 +46,8 @@ def number_of_words(community):
 def rounded_date(community, round_dates_to='7D'):
     """
     Round the post dates according to specified frequency.
-    If ``round_dates_to`` is None (default), this preprocessor does nothing.
+    If ``round_dates_to`` is None, this preprocessor does nothing. Rounded
+    dates stored with the cache (``rounded_date_<frequency>``) are reused.
 
     Args:
         community:
@@ -53,6 +57,10 @@ def rounded_date(community, round_dates_to='7D'):
         #timeseries-offset-aliases>
         for valid aliases.
     """
+    stored = f'rounded_date_{round_dates_to}'
+    if stored in community.posts.columns:
+        return community.posts[stored].rename('rounded_date')
+
     r_dates = community.posts[community.date_column]
     if round_dates_to is not None:
         r_dates = r_dates.dt.round(freq=round_dates_to)
@@ -10,7 +10,7 @@ def thread_text(community):
     """
 
     p = community.posts.sort_values(by=[community.date_column])
-    texts = p.groupby(by=community.topic_column)[
+    texts = p.groupby(by=community.topic_column, observed=True)[
         community.text_column].apply(tuple)
 
     return texts
\ No newline at end of file
@@ -0,0 +1,281 @@
+"""
+Shared-memory community data for multi-process workers.
+
+Passing a ``Community`` to worker processes pickles its frames, so every
+worker holds a full copy. ``publish_community`` instead copies the
+community's numeric, boolean, datetime and categorical columns (and
+indices) once into shared memory (``multiprocessing.shared_memory``, one
+segment per table) and returns a small, picklable ``SharedCommunityHandle``.
+Workers call ``attach_community(handle)`` to get a community whose frames
+are backed by the shared segments without copying them.
+
+Object columns (texts, tuples of words) can not be shared. They are left
+out, or copied into the handle with ``copy_objects=True`` (then every
+worker receives its own copy of them).
+
+The publishing process owns the segments: keep the ``SharedCommunityData``
+returned by ``publish_community`` alive while workers use the data and call
+``unlink()`` (or use it as context manager) when done. Workers keep the
+segments they attached to mapped until they exit. Attached data must be
+treated as read-only, writes are visible to all processes.
+
+Examples:
+    === "Python"
+    ``` py
+    from concurrent.futures import ProcessPoolExecutor
+    from pici.shared import publish_community, attach_community
+
+    def work(handle):
+        community = attach_community(handle)
+        return community.metrics.number_of_posts().data
+
+    with publish_community(community) as shared:
+        with ProcessPoolExecutor(16) as executor:
+            results = list(executor.map(work, [shared.handle] * 16))
+    ```
+"""
+import logging
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from pici.bundle import class_path, import_class
+
+LOGGER = logging.getLogger(__name__)
+
+SHARED_TABLES = ['posts', 'contributors', 'topics']
+
+_ALIGNMENT = 64
+
+# segments attached by this process, by name. They stay mapped as long as the
+# process runs, as frames created from them may outlive their community.
+_attached_segments = {}
+
+
+class SharedCommunityHandle:
+    """
+    Picklable description of a community published to shared memory: the
+    community's class, name, window and state, and for every table the
+    shared memory segment and the layout of its columns.
+    """
+
+    def __init__(self, cls, name, window, source, state, tables):
+        self.cls = cls
+        self.name = name
+        self.window = window
+        self.source = source
+        self.state = state
+        self.tables = tables
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name}, " \
+               f"segments={[t['segment'] for t in self.tables.values()]})"
+
+
+class SharedCommunityData:
+    """
+    Owner of the shared memory segments of a published community.
+    """
+
+    def __init__(self, handle, segments):
+        self.handle = handle
+        self._segments = segments
+
+    @property
+    def nbytes(self):
+        return sum(s.size for s in self._segments)
+
+    def close(self):
+        for s in self._segments:
+            s.close()
+
+    def unlink(self):
+        """
+        Close and free the shared memory segments.
+        """
+        self.close()
+        for s in self._segments:
+            s.unlink()
+        self._segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.unlink()
+
+
+def _layout(values):
+    """
+    Layout of an array-like in shared memory: the numpy array to copy
+    (None if it can not be shared) and the information needed to re-create
+    the pandas values from it.
+    """
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        codes = np.asarray(values.codes if hasattr(values, 'codes')
+                           else values.cat.codes)
+        return codes, {'kind': 'categorical',
+                       'categories': dtype.categories,
+                       'ordered': dtype.ordered}
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return np.asarray(values.tz_convert(None) if hasattr(values, 'tz')
+                          else values.dt.tz_convert(None)), \
+            {'kind': 'datetime', 'tz': dtype.tz}
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM':
+        return np.asarray(values), {'kind': 'array'}
+
+    return None, {'kind': 'object'}
+
+
+def _unlayout(array, spec):
+    if spec['kind'] == 'categorical':
+        return pd.Categorical.from_codes(
+            array, dtype=pd.CategoricalDtype(spec['categories'],
+                                             spec['ordered']))
+    if spec['kind'] == 'datetime':
+        return pd.arrays.DatetimeArray(
+            array, dtype=pd.DatetimeTZDtype(tz=spec['tz']), copy=False)
+
+    return array
+
+
+def _publish_table(df, copy_objects):
+    """
+    Copy the shareable columns and the index of ``df`` into one shared
+    memory segment.
+
+    Returns: (SharedMemory, table layout)
+    """
+    arrays = []
+    columns = []
+    for i, c in enumerate(df.columns):
+        array, spec = _layout(df.iloc[:, i])
+        spec['name'] = c
+        if array is None:
+            if not copy_objects:
+                continue
+            spec['values'] = df.iloc[:, i].values
+        columns.append(spec)
+        arrays.append(array)
+
+    index, index_spec = _layout(df.index)
+    index_spec['name'] = df.index.name
+    if index is None:
+        index_spec['values'] = df.index.values
+    columns.append(index_spec)
+    arrays.append(index)
+
+    offset = 0
+    for spec, array in zip(columns, arrays):
+        if array is None:
+            continue
+        offset = -(-offset // _ALIGNMENT) * _ALIGNMENT
+        spec.update(offset=offset, dtype=array.dtype.str, length=len(array))
+        offset += array.nbytes
+
+    segment = SharedMemory(create=True, size=max(offset, 1))
+    for spec, array in zip(columns, arrays):
+        if array is not None:
+            target = np.ndarray(len(array), dtype=array.dtype,
+                                buffer=segment.buf, offset=spec['offset'])
+            target[:] = array
+
+    return segment, {
+        'segment': segment.name,
+        'columns': columns[:-1],
+        'index': columns[-1]
+    }
+
+
+def publish_community(community, copy_objects=False):
+    """
+    Publish the tables of a community to shared memory.
+
+    Args:
+        community: pici.Community
+        copy_objects: Copy columns that can not be shared (object dtype)
+            into the handle (default: leave them out).
+
+    Returns: SharedCommunityData (``handle`` is passed to workers)
+    """
+    segments = []
+    tables = {}
+    try:
+        for table in SHARED_TABLES:
+            segment, layout = _publish_table(getattr(community, table),
+                                              copy_objects)
+            segments.append(segment)
+            tables[table] = layout
+    except Exception:
+        for s in segments:
+            s.close()
+            s.unlink()
+        raise
+
+    handle = SharedCommunityHandle(
+        cls=class_path(type(community)),
+        name=community.name,
+        window=community.window,
+        source=community.source,
+        state=community._get_state(),
+        tables=tables
+    )
+    LOGGER.info(f"Published {community.name} to shared memory "
+                f"({sum(s.size for s in segments)} bytes).")
+
+    return SharedCommunityData(handle, segments)
+
+
+def _attach_segment(name):
+    if name in _attached_segments:
+        return _attached_segments[name]
+    try:
+        segment = SharedMemory(name=name, track=False)
+    except TypeError:
+        # python < 3.13: attaching registers the segment with the resource
+        # tracker, which would remove it when this process ends
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            segment = SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+    _attached_segments[name] = segment
+
+    return segment
+
+
+def _attach_values(segment, spec):
+    if 'values' in spec:
+        return spec['values']
+    array = np.frombuffer(segment.buf, dtype=np.dtype(spec['dtype']),
+                          count=spec['length'], offset=spec['offset'])
+
+    return _unlayout(array, spec)
+
+
+def attach_community(handle):
+    """
+    Create a community from a ``SharedCommunityHandle``. The community's
+    frames are backed by the shared memory segments (zero-copy).
+
+    Args:
+        handle: SharedCommunityHandle
+
+    Returns: pici.Community
+    """
+    tables = {}
+    for table, layout in handle.tables.items():
+        segment = _attach_segment(layout['segment'])
+        index = pd.Index(_attach_values(segment, layout['index']),
+                         name=layout['index']['name'], copy=False)
+        tables[table] = pd.DataFrame({
+            spec['name']: _attach_values(segment, spec)
+            for spec in layout['columns']
+        }, index=index, copy=False)
+
+    return import_class(handle.cls)._from_tables(
+        handle.name, handle.window, handle.source, tables, handle.state)
@@ -0,0 +1,547 @@
+"""
+Temporal (cumulative) contributor graphs.
+
+``Community.temporal_graph(end=date)`` builds the co-contributor or
+commenter graph of all posts before ``date`` from scratch.
+
+``TemporalEdges`` keeps the weight increments of a graph as timestamped
+edge table instead, sorted by date, so the graph as of any date is a slice
+of that table (aggregated into weighted edges) that can be converted to a
+networkx graph or a ``pici.graphs.SparseGraph``. Snapshots as of many
+dates (``TemporalEdges.snapshots``, ``Community.temporal_graphs``) start
+from one slice and add the increments between consecutive dates, so all
+snapshots together cost about as much as building the full graph once.
+
+``snapshot_metrics`` computes network metrics of many snapshots at once:
+the (kind, date, metric) tasks are collected up front, split into runs of
+consecutive dates (each starting from a snapshot sliced from
+``TemporalEdges``) and computed in a pool of worker processes that attach
+to the community's shared data (see ``pici.shared``).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from pici.graphs import SparseGraph
+from pici.helpers import _factorize
+from pici.shared import attach_community
+
+GRAPH_KINDS = ['co_contributor', 'commenter']
+
+SNAPSHOT_METRICS = {
+    'degree_centrality': nx.degree_centrality,
+    'in_degree_centrality': nx.in_degree_centrality,
+    'out_degree_centrality': nx.out_degree_centrality,
+    'closeness_centrality': nx.closeness_centrality,
+    'betweenness_centrality': partial(nx.betweenness_centrality,
+                                      weight='weight')
+}
+"""
+Metrics ``snapshot_metrics`` computes by default: functions of a networkx
+graph that return a dict of node: value.
+"""
+
+
+def commenter_events(community):
+    """
+    Weight increments of the commenter graph in date order: one
+    (initiator, contributor) edge per post, with the post's position in the
+    date-sorted posts.
+
+    Returns: (sources, targets, positions, labels) with sources and targets
+    as codes of ``labels``
+    """
+    posts = community.posts
+    nodes, labels = _factorize(posts[community.contributor_column])
+    groups, _ = _factorize(posts[community.topic_column])
+    positions = np.flatnonzero(groups >= 0)
+    nodes, groups = nodes[positions], groups[positions]
+
+    group_ids, first = np.unique(groups, return_index=True)
+    initiators = nodes[first][np.searchsorted(group_ids, groups)]
+    valid = (initiators >= 0) & (nodes >= 0)
+
+    return initiators[valid], nodes[valid], positions[valid], labels
+
+
+def co_contributor_events(community):
+    """
+    Weight increments of the co-contributor graph in date order: when a
+    contributor posts in a thread for the first time, one (contributor,
+    member) edge for every earlier member of the thread, with the post's
+    position in the date-sorted posts. Missing and empty contributors are
+    skipped.
+
+    Returns: (sources, targets, positions, labels) with sources and targets
+    as codes of ``labels``
+    """
+    posts = community.posts
+    nodes, labels = _factorize(posts[community.contributor_column])
+    groups, _ = _factorize(posts[community.topic_column])
+    valid = (nodes >= 0) & (groups >= 0)
+    if len(labels):
+        valid &= ~np.asarray(labels == '', dtype=bool)[np.maximum(nodes, 0)]
+    positions = np.flatnonzero(valid)
+    nodes, groups = nodes[positions], groups[positions]
+
+    # first post of every member of every thread, by thread and position
+    _, first = np.unique(groups.astype(np.int64) * len(labels) + nodes,
+                         return_index=True)
+    first = first[np.lexsort((positions[first], groups[first]))]
+    nodes, groups, positions = nodes[first], groups[first], positions[first]
+
+    # every member is linked to the members of its thread that came before
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    start = np.repeat(starts, np.diff(np.r_[starts, len(groups)]))
+    earlier = np.arange(len(groups)) - start
+    offsets = np.arange(earlier.sum()) - np.repeat(
+        np.cumsum(earlier) - earlier, earlier)
+    targets = nodes[np.repeat(start, earlier) + offsets]
+
+    return np.repeat(nodes, earlier), targets, np.repeat(positions, earlier), \
+        labels
+
+
+EVENTS = {
+    'co_contributor': co_contributor_events,
+    'commenter': commenter_events
+}
+
+
+class TemporalEdges:
+    """
+    Timestamped edge table of a cumulative co-contributor or commenter
+    graph: its weight increments (source, target, position) sorted by
+    position in the date-sorted posts. The graph as of a cut-off consists
+    of the increments before it, so every snapshot is a slice of the
+    table, aggregated into weighted edges.
+
+    Edges are listed in the order of the (source, target) codes, as the
+    graphs built from posts (``create_co_contributor_graph``,
+    ``create_commenter_graph``) do. Undirected edges are stored with the
+    smaller code as source.
+
+    Args:
+        sources, targets: node codes of the weight increments
+        positions: positions of the weight increments
+        labels: node labels (by code)
+        directed: Whether the graph is directed.
+        community: pici.Community the positions refer to (used to convert
+            dates to positions)
+    """
+
+    def __init__(self, sources, targets, positions, labels, directed=True,
+                 community=None):
+        self.labels = pd.Index(labels)
+        self.directed = directed
+        self.community = community
+        if not directed:
+            sources, targets = np.minimum(sources, targets), \
+                np.maximum(sources, targets)
+        order = np.argsort(positions, kind='stable')
+        self.sources = sources[order]
+        self.targets = targets[order]
+        self.positions = positions[order]
+        self._n = max(len(self.labels), 1)
+        self._keys = self.sources.astype(np.int64) * self._n + self.targets
+
+    @classmethod
+    def from_community(cls, community, kind='co_contributor'):
+        """
+        Temporal edges of the ``kind`` graph of ``community``.
+        """
+        if kind not in GRAPH_KINDS:
+            raise ValueError(f"Unknown graph kind {kind}, use one of "
+                             f"{GRAPH_KINDS}.")
+
+        return cls(*EVENTS[kind](community), directed=kind == 'commenter',
+                   community=community)
+
+    def stop(self, end=None):
+        """
+        Cut-off position of the date ``end`` (None: after the last dated
+        post).
+        """
+        c = self.community
+        return c._date_slice(c.posts, c.date_column, None, end,
+                             include_start=False).stop
+
+    def edges(self, end=None):
+        """
+        Weighted edges of the graph of all posts before ``end``.
+
+        Returns: (sources, targets, weights) as arrays of node codes and
+        weights
+        """
+        k = np.searchsorted(self.positions, self.stop(end), side='left')
+        keys, weights = np.unique(self._keys[:k], return_counts=True)
+
+        return keys // self._n, keys % self._n, weights
+
+    def table(self):
+        """
+        The distinct edges with the date they were first seen and their
+        total weight.
+
+        Returns: pandas.DataFrame with columns source, target, first_seen,
+        weight
+        """
+        keys, first, weights = np.unique(self._keys, return_index=True,
+                                         return_counts=True)
+        c = self.community
+        dates = c.posts[c.date_column].to_numpy()[self.positions[first]] \
+            if c is not None else self.positions[first]
+
+        return pd.DataFrame({
+            'source': self.labels[keys // self._n],
+            'target': self.labels[keys % self._n],
+            'first_seen': dates,
+            'weight': weights
+        })
+
+    def to_networkx(self, end=None):
+        """
+        The graph of all posts before ``end`` as networkx Graph or DiGraph
+        (without node attributes).
+        """
+        sources, targets, weights = self.edges(end)
+        G = nx.DiGraph() if self.directed else nx.Graph()
+        G.add_weighted_edges_from(zip(self.labels[sources],
+                                      self.labels[targets],
+                                      weights.tolist()))
+
+        return G
+
+    def snapshots(self, ends, copy=True):
+        """
+        Snapshots of the graph at each of the (sorted) cut-offs ``ends``.
+        The first snapshot is sliced from the table (see ``to_networkx``),
+        later ones add the increments between consecutive cut-offs.
+
+        Args:
+            ends: iterable of dates
+            copy: Yield copies of the graph. If False, the same graph is
+                yielded (and changed) for every cut-off.
+
+        Yields: tuples of (end, networkx graph)
+        """
+        graph = None
+        position = 0
+        for end in ends:
+            stop = np.searchsorted(self.positions, self.stop(end),
+                                   side='left')
+            if graph is None:
+                graph = self.to_networkx(end)
+            elif stop < position:
+                raise ValueError(f"Snapshot dates have to be sorted, {end} "
+                                 f"is too early.")
+            else:
+                keys, weights = np.unique(self._keys[position:stop],
+                                          return_counts=True)
+                for u, v, w in zip(self.labels[keys // self._n],
+                                   self.labels[keys % self._n],
+                                   weights.tolist()):
+                    if graph.has_edge(u, v):
+                        graph[u][v]['weight'] += w
+                    else:
+                        graph.add_edge(u, v, weight=w)
+            position = stop
+            yield end, graph.copy() if copy else graph
+
+    def to_sparse(self, end=None):
+        """
+        The graph of all posts before ``end`` as
+        ``pici.graphs.SparseGraph`` (nodes in code order).
+        """
+        sources, targets, weights = self.edges(end)
+        nodes, codes = np.unique(np.concatenate([sources, targets]),
+                                 return_inverse=True)
+
+        return SparseGraph.from_edges(codes[:len(sources)],
+                                      codes[len(sources):], weights,
+                                      self.labels[nodes],
+                                      directed=self.directed)
+
+
+class TemporalDegrees:
+    """
+    Degrees of the nodes of a cumulative temporal graph as of any cut-off,
+    without building graph snapshots. An edge exists as of cut-off ``stop``
+    (a position in the date-sorted posts) if its first weight increment
+    happened before ``stop``, and a node exists if one of its edges does.
+    Degrees are prefix counts over the edges' first positions, sorted by
+    node.
+
+    Args:
+        sources, targets: node codes of the weight increments
+        positions: positions of the weight increments
+        labels: node labels (by code)
+        directed: If False, every increment counts for both nodes.
+        community: pici.Community the positions refer to (used to convert
+            dates to positions)
+    """
+
+    def __init__(self, sources, targets, positions, labels, directed=True,
+                 community=None):
+        self.labels = pd.Index(labels)
+        self.directed = directed
+        self.community = community
+        if not directed:
+            sources, targets = np.concatenate([sources, targets]), \
+                np.concatenate([targets, sources])
+            positions = np.concatenate([positions, positions])
+        order = np.argsort(positions, kind='stable')
+        sources, targets = sources[order], targets[order]
+        positions = positions[order]
+        n = len(self.labels)
+        # positions and cut-offs are stored per node as node * stride + stop
+        self._stride = int(positions[-1]) + 2 if len(positions) else 1
+
+        self.node_first = np.full(n, np.iinfo(np.int64).max)
+        self._edges = {}
+        self._weights = {}
+        for direction, (a, b) in {'out': (sources, targets),
+                                  'in': (targets, sources)}.items():
+            # first position of every distinct edge (a, b)
+            _, first = np.unique(a.astype(np.int64) * n + b,
+                                 return_index=True)
+            np.minimum.at(self.node_first, a[first], positions[first])
+            self._edges[direction] = np.sort(self._keys(a[first],
+                                                        positions[first]))
+            self._weights[direction] = np.sort(self._keys(a, positions))
+        self._node_firsts = np.sort(self.node_first)
+
+    def _keys(self, nodes, stops):
+        return nodes.astype(np.int64) * self._stride + \
+            np.minimum(stops, self._stride - 1)
+
+    @classmethod
+    def from_community(cls, community, kind='commenter'):
+        """
+        Temporal degrees of the ``kind`` graph of ``community``.
+        """
+        if kind not in GRAPH_KINDS:
+            raise ValueError(f"Unknown graph kind {kind}, use one of "
+                             f"{GRAPH_KINDS}.")
+
+        return cls(*EVENTS[kind](community), directed=kind == 'commenter',
+                   community=community)
+
+    def stops(self, ends):
+        """
+        Cut-off positions of the dates ``ends`` (-1 for missing dates).
+        """
+        c = self.community
+        ends = pd.Series(ends)
+        stops = {
+            end: c._date_slice(c.posts, c.date_column, None, end,
+                               include_start=False).stop
+            for end in ends.dropna().unique()
+        }
+
+        return ends.map(stops).fillna(-1).to_numpy(dtype=np.int64)
+
+    def codes(self, nodes):
+        """
+        Codes of ``nodes`` (-1 for unknown nodes).
+        """
+        return self.labels.get_indexer(pd.Index(nodes))
+
+    def number_of_nodes(self, stops):
+        """
+        Number of nodes of the graph as of each cut-off position.
+        """
+        return np.searchsorted(self._node_firsts, stops, side='left')
+
+    def degree(self, nodes, ends, direction='in', weighted=False):
+        """
+        Degree of each of ``nodes`` as of the corresponding date in
+        ``ends`` (NaN if the node is not part of the graph at that date).
+
+        Args:
+            nodes: node labels
+            ends: dates (cut-offs, exclusive)
+            direction: 'in' or 'out' (ignored for undirected graphs)
+            weighted: Sum of edge weights instead of number of edges.
+
+        Returns: numpy array
+        """
+        return self._degree(self.codes(nodes), self.stops(ends), direction,
+                            weighted)
+
+    def _degree(self, codes, stops, direction, weighted):
+        keys = (self._weights if weighted else self._edges)[direction]
+        codes_, stops_ = np.maximum(codes, 0), np.maximum(stops, 0)
+        degree = (np.searchsorted(keys, self._keys(codes_, stops_)) -
+                  np.searchsorted(keys, self._keys(codes_, 0))).astype(float)
+        exists = (codes >= 0) & (stops >= 0) & \
+            (self.node_first[np.maximum(codes, 0)] < stops)
+        degree[~exists] = np.nan
+
+        return degree
+
+    def centrality(self, nodes, ends, direction='in'):
+        """
+        Degree centrality (as ``networkx.in_degree_centrality`` /
+        ``out_degree_centrality``, or ``degree_centrality`` for undirected
+        graphs) of each of ``nodes`` as of the corresponding date in
+        ``ends``.
+
+        Returns: numpy array
+        """
+        stops = self.stops(ends)
+        degree = self._degree(self.codes(nodes), stops, direction, False)
+        n = self.number_of_nodes(np.maximum(stops, 0))
+        with np.errstate(divide='ignore'):
+            s = 1.0 / (n - 1)
+
+        return np.where(n > 1, degree * s, np.where(np.isnan(degree),
+                                                    np.nan, 1.0))
+
+
+def _snapshot_run(community, kind, run, metrics):
+    """
+    Compute the metrics of the snapshots of a run of (sorted) dates. The
+    graph of the run's first date is sliced from the community's
+    ``temporal_edges`` and updated for the following dates.
+
+    Args:
+        run: list of (date, metric names)
+        metrics: dict of metric name: function
+
+    Returns: list of (kind, date, {metric: {node: value}})
+    """
+    snapshots = community.temporal_edges(kind).snapshots(
+        [date for date, _ in run], copy=False)
+
+    return [
+        (kind, date, {m: metrics[m](graph) for m in names})
+        for (date, graph), (_, names) in zip(snapshots, run)
+    ]
+
+
+# community of a snapshot worker process (see ``snapshot_metrics``)
+_worker_community = None
+
+
+def _attach_worker(handle):
+    global _worker_community
+    _worker_community = attach_community(handle)
+
+
+def _worker_snapshot_run(kind, run, metrics):
+    return _snapshot_run(_worker_community, kind, run, metrics)
+
+
+def _snapshot_table(results, contributor_column):
+    values = {}
+    for kind, date, by_metric in results:
+        for metric, by_node in by_metric.items():
+            dates, nodes, column = values.setdefault((kind, metric),
+                                                     ([], [], []))
+            dates.extend([date] * len(by_node))
+            nodes.extend(by_node.keys())
+            column.extend(by_node.to_numpy() if isinstance(by_node, pd.Series)
+                          else by_node.values())
+
+    names = ['date', contributor_column]
+    if not values:
+        return pd.DataFrame(
+            index=pd.MultiIndex.from_arrays([[], []], names=names),
+            columns=pd.MultiIndex.from_tuples([], names=['kind', 'metric']))
+
+    table = pd.concat({
+        key: pd.Series(column, index=pd.MultiIndex.from_arrays(
+            [pd.DatetimeIndex(dates), nodes], names=names), dtype=float)
+        for key, (dates, nodes, column) in values.items()
+    }, axis=1, names=['kind', 'metric'])
+
+    return table.sort_index()
+
+
+def snapshot_metrics(community, tasks, metrics=None, n_jobs=None):
+    """
+    Network metrics of temporal graph snapshots, as table of date x
+    contributor.
+
+    The sorted dates of each kind are computed in runs of consecutive
+    dates: the snapshot of a run's first date is sliced from the
+    community's ``temporal_edges``, later snapshots of the run add the
+    edges in between (see ``TemporalEdges.snapshots``). Without
+    ``n_jobs``, all dates of a kind are one run. With ``n_jobs``, the
+    dates are split into more runs than workers (to balance snapshots of
+    different size) that are computed in ``n_jobs`` worker processes,
+    which attach to the community's data in shared memory (see
+    ``Community.share``). Starting a run costs one vectorized slice of the
+    edge table, not a rebuild from the first post.
+
+    Args:
+        community: pici.Community
+        tasks: iterable of (kind, date, metric) for every snapshot metric
+            needed. The snapshot of ``date`` has all posts before ``date``.
+        metrics: dict of metric name: function of a networkx graph that
+            returns a dict (or pandas.Series) of node: value (default:
+            ``SNAPSHOT_METRICS``).
+            Functions have to be picklable when using ``n_jobs``.
+        n_jobs: Number of worker processes (None or 1: compute in this
+            process).
+
+    Returns: pandas.DataFrame indexed by (date, contributor) with a column
+    per (kind, metric), NaN for contributors that are not part of a
+    snapshot
+    """
+    metrics = SNAPSHOT_METRICS if metrics is None else metrics
+    by_kind = {}
+    for kind, date, metric in tasks:
+        if kind not in GRAPH_KINDS:
+            raise ValueError(f"Unknown graph kind {kind}, use one of "
+                             f"{GRAPH_KINDS}.")
+        if metric not in metrics:
+            raise ValueError(f"The network metric {metric} is not defined.")
+        by_kind.setdefault(kind, {}).setdefault(
+            pd.Timestamp(date), set()).add(metric)
+
+    runs = {
+        kind: [(date, sorted(dates[date])) for date in sorted(dates)]
+        for kind, dates in by_kind.items()
+    }
+    if n_jobs is None or n_jobs == 1:
+        results = [r for kind, run in runs.items()
+                   for r in _snapshot_run(community, kind, run, metrics)]
+    else:
+        jobs = [(kind, list(chunk)) for kind, run in runs.items()
+                for chunk in np.array_split(np.arange(len(run)), n_jobs * 4)
+                if len(chunk)]
+        with community.share() as shared:
+            with ProcessPoolExecutor(max_workers=n_jobs,
+                                     initializer=_attach_worker,
+                                     initargs=(shared.handle,)) as executor:
+                results = [
+                    r for job in executor.map(
+                        _worker_snapshot_run,
+                        [kind for kind, _ in jobs],
+                        [[runs[kind][i] for i in chunk]
+                         for kind, chunk in jobs],
+                        [metrics] * len(jobs))
+                    for r in job
+                ]
+
+    return _snapshot_table(results, community.contributor_column)
+
+
+def lookup_snapshot_metric(table, column, dates, nodes):
+    """
+    Values of ``column`` (a (kind, metric) column of a ``snapshot_metrics``
+    table) for pairs of ``dates`` and ``nodes``.
+
+    Returns: numpy array (NaN if a node is not part of the snapshot)
+    """
+    if column not in table.columns:
+        return np.full(len(dates), np.nan)
+    index = pd.MultiIndex.from_arrays([pd.DatetimeIndex(dates),
+                                       np.asarray(nodes, dtype=object)])
+
+    return table[column].reindex(index).to_numpy(dtype=float)
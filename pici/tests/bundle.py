@@ -0,0 +1,49 @@
+import tempfile
+
+import pandas as pd
+
+from pici.bundle import check_bundle
+from pici.community import Community
+from pici.communities.preciousplastic import PPCommunity
+
+
+def _community():
+    data = {
+        'posts': pd.DataFrame.from_dict({
+            'topic': ['t1', 't1', 't2', 't1'],
+            'author': ['a', 'b', 'b', 'c'],
+            'date': ['2020-01-01 10:00', '2020-01-02 10:00',
+                     '2020-02-01 10:00', '2020-03-01 10:00'],
+            'text': ['x', 'y', 'z', 'w']
+        }),
+        'users': pd.DataFrame.from_dict({'id': ['a', 'b', 'c']}),
+        'topics': pd.DataFrame.from_dict({'id': ['t1', 't2']})
+    }
+    return PPCommunity('test', data)
+
+
+def test_bundle_roundtrip():
+    c = _community()
+    c.posts['preprocessed_text__words'] = [('x',), ('y',), ('z',), ('w',)]
+    graph = c.co_contributor_graph
+    with tempfile.TemporaryDirectory() as path:
+        c.save_bundle(path, parameters={'n_topics': 10})
+        b = Community.load_bundle(path, parameters={'n_topics': 10},
+                                  window=(None, None))
+        assert isinstance(b, PPCommunity)
+        assert b == c
+        assert b.posts.equals(c.posts)
+        assert b.posts['author'].dtype == 'category'
+        assert set(b.co_contributor_graph.edges) == set(graph.edges)
+        assert check_bundle(path, parameters={'n_topics': 10}) == []
+        assert len(check_bundle(path, parameters={'n_topics': 5})) == 1
+        try:
+            Community.load_bundle(path, window=('2020-01-01', None))
+            assert False
+        except ValueError:
+            pass
+
+
+if __name__ == "__main__":
+    test_bundle_roundtrip()
+    print("Everything passed")
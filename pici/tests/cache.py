@@ -0,0 +1,304 @@
+import datetime
+import os
+import tempfile
+
+import pandas as pd
+
+from pici.cache import get_cache_backend, find_cache_files, migrate_cache, \
+    prepare_table, CacheManifest
+from pici.community import CommunityFactory
+from pici.helpers import THREAD_STRUCTURE_COLUMNS
+from pici.communities.osm import OSMCommunityFactory
+
+
+def _posts():
+    return pd.DataFrame.from_dict({
+        'id': [1, 2, 3, 4],
+        'author': ['a', 'b', 'a', 'c'],
+        'date': ['2020-01-01 10:00', '2020-01-02 10:00',
+                 '2020-02-01 10:00', '2020-03-01 10:00']
+    })
+
+
+def test_parquet_roundtrip():
+    backend = get_cache_backend('parquet')
+    df = _posts()
+    df['date'] = pd.to_datetime(df['date'])
+    df['author'] = df['author'].astype('category')
+    with tempfile.TemporaryDirectory() as cache_dir:
+        path = backend.path(cache_dir, 'test', 'posts', '2020-01-01-00-00-00')
+        backend.write(df, path)
+        loaded = backend.read(path)
+        assert loaded['date'].dtype == df['date'].dtype
+        assert loaded['author'].dtype == 'category'
+        assert loaded['id'].dtype == 'int64'
+        assert backend.read(path, nrows=2).shape[0] == 2
+
+
+def test_parquet_nrows():
+    backend = get_cache_backend('parquet')
+    backend.row_group_size = 3
+    df = pd.concat([_posts()] * 3, ignore_index=True)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        path = backend.path(cache_dir, 'test', 'posts', '2020-01-01-00-00-00')
+        backend.write(df, path)
+        # more rows than in one row group
+        assert backend.read(path, nrows=8).equals(df.iloc[:8])
+        assert backend.read(path, nrows=20).equals(df)
+        assert backend.read(path, nrows=2, columns=['id']).columns.tolist() \
+            == ['id']
+
+
+def test_migrate_cache():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        csv = get_cache_backend('csv')
+        csv.write(_posts(), csv.path(cache_dir, 'test', 'posts',
+                                     '2020-01-01-00-00-00'))
+        created = migrate_cache(cache_dir, 'test', ['posts'],
+                                cache_format='parquet',
+                                date_columns={'posts': ['date']},
+                                remove_source=True)
+        assert len(created) == 1
+        files = find_cache_files(cache_dir, 'test', 'posts')
+        assert list(files.values()) == created
+        loaded = get_cache_backend('parquet').read(created[0])
+        assert 'Unnamed: 0' not in loaded.columns
+        assert str(loaded['date'].dtype) == 'datetime64[ns]'
+        manifest = CacheManifest(cache_dir, 'test', ['posts']).load()
+        assert manifest.latest == '2020-01-01-00-00-00'
+        assert manifest.verify(checksums=True) == []
+
+
+def test_date_window():
+    for cache_format in ['csv', 'parquet']:
+        backend = get_cache_backend(cache_format)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = backend.path(cache_dir, 'test', 'posts',
+                                '2020-01-01-00-00-00')
+            backend.write(prepare_table(_posts(), ['date']), path)
+            window = backend.read(path, date_column='date',
+                                  start='2020-01-02', end='2020-03-01')
+            assert window['id'].tolist() == [2, 3]
+
+            # tables without rows keep their columns
+            backend.write(prepare_table(_posts().iloc[:0], ['date']), path)
+            for nrows in [None, 0]:
+                window = backend.read(path, nrows=nrows, date_column='date',
+                                      start='2020-01-02', end='2020-03-01')
+                assert len(window) == 0
+                assert 'id' in window.columns
+
+
+def test_column_projection():
+    for cache_format in ['csv', 'parquet']:
+        backend = get_cache_backend(cache_format)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = backend.path(cache_dir, 'test', 'posts',
+                                '2020-01-01-00-00-00')
+            backend.write(prepare_table(_posts(), ['date']), path)
+            df = backend.read(path, columns=['author'], date_column='date',
+                              start='2020-01-02')
+            assert set(df.columns) == {'author', 'date'}
+            assert backend.read(path, nrows=2, columns=['id']).shape == (2, 1)
+
+
+def test_manifest():
+    backend = get_cache_backend('parquet')
+    with tempfile.TemporaryDirectory() as cache_dir:
+        manifest = CacheManifest(cache_dir, 'test', ['posts', 'users'])
+        for date in ['2020-01-01-00-00-00', '2021-01-01-00-00-00']:
+            path = backend.path(cache_dir, 'test', 'posts', date)
+            backend.write(_posts(), path)
+            manifest.add(date, 'posts', path)
+        assert manifest.latest is None
+
+        path = backend.path(cache_dir, 'test', 'users', '2020-01-01-00-00-00')
+        backend.write(_posts(), path)
+        manifest.add('2020-01-01-00-00-00', 'users', path)
+        manifest.save()
+
+        loaded = CacheManifest(cache_dir, 'test', ['posts', 'users'])
+        assert loaded.latest == '2020-01-01-00-00-00'
+        assert loaded.snapshots[loaded.latest]['tables']['posts']['rows'] == 4
+        assert loaded.verify(checksums=True) == []
+
+        os.remove(path)
+        assert len(loaded.verify()) == 1
+        assert loaded.rebuild().latest is None
+
+
+def test_manifest_deltas():
+    backend = get_cache_backend('parquet')
+    with tempfile.TemporaryDirectory() as cache_dir:
+        manifest = CacheManifest(cache_dir, 'test', ['posts'])
+        base, delta = '2020-01-01-00-00-00', '2020-01-02-00-00-00'
+        path = backend.path(cache_dir, 'test', 'posts', base)
+        backend.write(_posts(), path)
+        manifest.add(base, 'posts', path)
+        manifest.set_high_water_mark(base, '2020-01-01T10:00:00')
+        assert manifest.high_water_mark == '2020-01-01T10:00:00'
+
+        path = backend.path(cache_dir, 'test',
+                            f'posts{manifest.delta_suffix}', delta)
+        backend.write(_posts(), path)
+        manifest.add(delta, 'posts', path, base=base)
+        assert manifest.latest == base
+        assert manifest.deltas() == [delta]
+        assert manifest.high_water_mark == '2020-01-02T00:00:00'
+
+        manifest.rebuild()
+        assert manifest.latest == base
+        assert manifest.deltas() == [delta]
+
+
+def _osm_posts(topics, replies, start=0):
+    rows = [(t, r) for t in topics for r in range(replies)]
+    return pd.DataFrame.from_dict({
+        'reply_id': [t * 100 + r for t, r in rows],
+        'reply_date': [f'2020-01-{t + 1:02d} 10:{r:02d}:00' for t, r in rows],
+        'reply_content': [f'{t}-{r}-{start}' for t, r in rows],
+        'author_name': [f'u{(t + r) % 7}' for t, r in rows],
+        'author_type': 'user',
+        'author_from': '',
+        'author_registered_date': '2019-01-01',
+        'topic_id': [f't{t}' for t, _ in rows],
+        'topic_title': [f'topic {t}' for t, _ in rows],
+        'topic_url': '',
+        'forum_title': 'forum',
+        'forum_id': 1,
+        'forum_url': ''
+    })
+
+
+class _OSMTestFactory(OSMCommunityFactory):
+
+    def scrape_data(self):
+        self._data = {'posts': _osm_posts(range(10), 20)}
+        self.add_data_to_cache(self._data)
+
+    def scrape_delta(self, since):
+        # re-scrape topic 9 (one new reply) and a new topic 10
+        return {'posts': pd.concat([_osm_posts([9], 21, start=1),
+                                    _osm_posts([10], 5, start=1)])}
+
+
+class _FullScrapeTestFactory(_OSMTestFactory):
+    scrape_delta = CommunityFactory.scrape_delta
+
+
+class _RelativeDatesTestFactory(_OSMTestFactory):
+    scrape_delta = OSMCommunityFactory.scrape_delta
+
+    def _run_spider(self, since=None):
+        # recent posts as displayed by the forum
+        posts = _osm_posts([10], 3, start=1)
+        posts['reply_date'] = ['Yesterday 23:00:00', 'Today 10:12:03',
+                               'Today 10:15:00']
+        return posts
+
+
+def test_relative_delta_dates():
+    today = pd.Timestamp(datetime.date.today())
+    with tempfile.TemporaryDirectory() as cache_dir:
+        factory = _RelativeDatesTestFactory(cache_dir=cache_dir)
+        factory.update_cache()
+        delta = factory.update_cache()
+        dates = [today - pd.Timedelta('01:00:00'),
+                 today + pd.Timedelta('10:12:03'),
+                 today + pd.Timedelta('10:15:00')]
+        assert pd.to_datetime(delta['posts']['reply_date']).tolist() == dates
+        assert pd.Timestamp(factory.manifest.high_water_mark) == dates[-1]
+
+        c = factory.create_community()
+        assert len(c.posts) == 203
+        assert c.posts.loc[c.posts['topic_id'] == 't10',
+                           'date'].tolist() == dates
+
+
+def test_factory_deltas():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        factory = _OSMTestFactory(cache_dir=cache_dir,
+                                  cache_columns={'posts': ['reply_content']})
+        factory.update_cache()
+        base = factory.manifest.latest
+        # the delta is written in the same second as its base
+        delta = factory.update_cache()
+        assert len(delta['posts']) == 26
+        assert factory.manifest.latest == base
+        assert len(factory.manifest.deltas()) == 1
+
+        c = factory.create_community()
+        assert len(c.posts) == 206
+        assert c.posts['reply_id'].is_unique
+        assert set(c.posts.loc[c.posts['topic_id'] == 't9',
+                               'reply_content'].str[-1]) == {'1'}
+
+        factory.compact_cache()
+        assert factory.manifest.latest != base
+        assert factory.manifest.deltas() == []
+        assert len(factory.create_community().posts) == 206
+
+        factory = _FullScrapeTestFactory(cache_dir=cache_dir)
+        factory.update_cache()
+        assert factory.manifest.deltas() == []
+        assert len(factory.create_community().posts) == 200
+
+
+def test_factory_migrate_cache():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # CSV snapshot created before manifests existed
+        csv = get_cache_backend('csv')
+        posts = _osm_posts(range(10), 20)
+        posts.loc[0, 'reply_date'] = 'Today 10:12:03'
+        csv.write(posts,
+                  csv.path(cache_dir, 'osm', 'posts', '2020-01-01-00-00-00'))
+        factory = _OSMTestFactory(cache_dir=cache_dir, cache_format='parquet')
+        assert not factory.manifest.exists
+        created = factory.migrate_cache(remove_source=True)
+        assert len(created) == 1
+        assert factory.manifest.exists
+        assert factory.manifest.latest == '2020-01-01-00-00-00'
+        assert factory.verify_cache(checksums=True) == []
+        c = factory.create_community()
+        assert len(c.posts) == 200
+        # relative dates of the legacy snapshot are resolved when migrating
+        assert c.posts.loc[c.posts['reply_id'] == 0, 'date'].tolist() == [
+            pd.Timestamp('2021-07-12 10:12:03')]
+
+
+def test_thread_structure_load_paths():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # legacy snapshot without stored thread structure columns
+        csv = get_cache_backend('csv')
+        csv.write(_osm_posts(range(10), 20),
+                  csv.path(cache_dir, 'osm', 'posts', '2020-01-01-00-00-00'))
+        factory = _OSMTestFactory(cache_dir=cache_dir)
+        structures = []
+        for compact in [False, True]:
+            if compact:
+                factory.compact_cache()
+                snapshot = factory.manifest.snapshots[factory.manifest.latest]
+                assert 'is_initial_post' in \
+                    snapshot['tables']['posts']['schema']
+            for start, end in [(None, None),
+                               ('2020-01-03 10:10', '2020-01-08 10:10')]:
+                c = factory.create_community(start=start, end=end)
+                structures.append(c.posts[THREAD_STRUCTURE_COLUMNS])
+        for legacy, compacted in zip(structures[:2], structures[2:]):
+            pd.testing.assert_frame_equal(legacy, compacted)
+        assert structures[1]['is_initial_post'].sum() == 6
+
+
+if __name__ == "__main__":
+    test_parquet_roundtrip()
+    test_parquet_nrows()
+    test_migrate_cache()
+    test_date_window()
+    test_column_projection()
+    test_manifest()
+    test_manifest_deltas()
+    test_factory_deltas()
+    test_factory_migrate_cache()
+    test_relative_delta_dates()
+    test_thread_structure_load_paths()
+    print("Everything passed")
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+from pici.pici import Pici
+from pici.communities.preciousplastic import PPCommunity, PPCommunityFactory
+from pici.tests.bundle import _community
+
+
+class _TestFactory(PPCommunityFactory):
+    created = []
+
+    def create_community(self, name=None, use_cache=True,
+                         start=None, end=None):
+        self.created.append(name)
+        c = _community()
+        c.name = name
+        return c
+
+
+class _FailingFactory(_TestFactory):
+    fail = True
+
+    def create_community(self, name=None, use_cache=True,
+                         start=None, end=None):
+        if _FailingFactory.fail:
+            raise ValueError("no data")
+        return super().create_community(name, use_cache, start, end)
+
+
+class _WindowTestFactory(PPCommunityFactory):
+
+    def create_community(self, name=None, use_cache=True,
+                         start=None, end=None):
+        rng = np.random.default_rng(0)
+        n = 600
+        dates = pd.Timestamp('2020-01-01') + pd.to_timedelta(
+            rng.integers(0, 365 * 24, n), unit='h')
+        data = {
+            'posts': pd.DataFrame.from_dict({
+                'topic': [f't{t}' for t in rng.integers(0, 60, n)],
+                'author': [f'a{a}' for a in rng.integers(0, 25, n)],
+                'date': dates.astype(str),
+                'text': ['x'] * n
+            }),
+            'users': pd.DataFrame.from_dict({
+                'id': [f'a{a}' for a in range(25)]}),
+            'topics': pd.DataFrame.from_dict({
+                'id': [f't{t}' for t in range(60)]})
+        }
+        return PPCommunity(name, data, start, end)
+
+
+def _pici(**kwargs):
+    _TestFactory.created.clear()
+    _FailingFactory.fail = True
+    return Pici(communities={'a': _TestFactory, 'b': _TestFactory,
+                             'failing': _FailingFactory}, **kwargs)
+
+
+def test_lazy_loading():
+    p = _pici(lazy=True)
+    assert p.communities.loaded == []
+    assert _TestFactory.created == []
+    assert p.communities['a'].name == 'a'
+    assert p.communities.loaded == ['a']
+    assert _TestFactory.created == ['a']
+    try:
+        p.communities['failing']
+        assert False
+    except ValueError:
+        pass
+    assert p.communities.loaded == ['a']
+
+
+def test_load_all():
+    for n_jobs in [None, 2]:
+        p = _pici(n_jobs=n_jobs)
+        assert sorted(p.communities.loaded) == ['a', 'b']
+        assert list(p.load_errors) == ['failing']
+        assert isinstance(p.load_errors['failing'], ValueError)
+        assert sorted(p.communities) == ['a', 'b']
+        assert len(p.communities) == 2
+
+        # failed communities can be loaded again
+        _FailingFactory.fail = False
+        p.communities.load_all(n_jobs)
+        assert sorted(p.communities.loaded) == ['a', 'b', 'failing']
+        assert p.load_errors == {}
+        assert sorted(p.communities) == ['a', 'b', 'failing']
+        assert sorted(_TestFactory.created) == ['a', 'b', 'failing']
+
+
+def test_unload():
+    p = _pici(lazy=True)
+    c = p.communities['a']
+    assert c.co_contributor_graph.number_of_nodes() > 0
+    p.unload('a')
+    assert not p.communities.is_loaded('a')
+    assert 'a' in p.communities
+    assert p.communities['a'] is not c
+    assert _TestFactory.created == ['a', 'a']
+    # unloading a community that is not loaded does nothing
+    p.unload('b')
+    assert p.communities.loaded == ['a']
+
+
+def test_windows():
+    start, end = '2020-03-01', '2020-05-01'
+    loaded = Pici(communities={'c': _WindowTestFactory},
+                  start=start, end=end).communities['c']
+    window = dict(Pici(communities={'c': _WindowTestFactory}).windows(
+        freq='2MS', start=start, end=end))[pd.Timestamp(start)]['c']
+    assert window.posts.index.tolist() == loaded.posts.index.tolist()
+    for m in ['number_of_contributors_per_topic',
+              'idea_popularity_by_number_of_unique_users_commenting',
+              'initiator_centrality_in_co_contributor_network',
+              'initiator_prestige_by_commenter_network_in_deg_centrality']:
+        results = []
+        for c in [window, loaded]:
+            d = getattr(c.metrics, m)().data
+            d.index = d.index.astype(str)
+            results.append(d.sort_index())
+        pd.testing.assert_frame_equal(*results, check_dtype=False,
+                                      check_categorical=False)
+
+
+if __name__ == "__main__":
+    test_lazy_loading()
+    test_load_all()
+    test_unload()
+    test_windows()
+    print("Everything passed")
@@ -1,4 +1,8 @@
-from pici.helpers import where_all
+from pici.helpers import where_all, thread_structure, window_bounds, \
+    create_co_contributor_graph, co_contributor_adjacency, \
+    create_commenter_graph, graph_node_data
+from pici.community import ThreadIndex
+from pici.communities.preciousplastic import PPCommunity
 import pandas as pd
 
 
@@ -22,6 +26,155 @@ def test_where_all():
     assert(df[where_all(conditions_1)].shape[0] == 1)
 
 
+def test_thread_structure():
+    posts = pd.DataFrame.from_dict({
+        'topic': ['t1', 't2', 't1', 't1', 't2'],
+        'author': ['a', 'b', 'b', 'c', 'a'],
+        'date': pd.to_datetime(['2020-01-03', '2020-01-02', '2020-01-01',
+                                '2020-01-05', '2020-01-04'])
+    }).set_index(pd.Index([10, 11, 12, 13, 14]))
+    s = thread_structure(posts, 'date', 'topic', 'author')
+    assert(s.index.equals(posts.index))
+    assert(s['post_position_in_thread'].tolist() == [2, 1, 1, 3, 2])
+    assert(s['is_initial_post'].tolist() == [False, True, True, False, False])
+    assert(s['thread_initiator'].tolist() == ['b', 'b', 'b', 'b', 'b'])
+    assert((s['thread_start_date'] == pd.Timestamp('2020-01-01')).tolist()
+           == [True, False, True, True, False])
+
+
+def test_thread_index():
+    posts = pd.DataFrame.from_dict({
+        'topic': pd.Categorical(['t1', 't2', 't1', None, 't2', 't1'],
+                                categories=['t1', 't2', 't3']),
+        'author': ['a', 'b', 'b', 'c', 'b', 'a'],
+        'date': pd.to_datetime(['2020-01-03', '2020-01-02', '2020-01-01',
+                                '2020-01-05', '2020-01-04', '2020-01-06'])
+    })
+    threads = ThreadIndex(posts, 'topic', 'date')
+    assert(threads.offsets.tolist() == [0, 3, 5, 5])
+    assert(threads.sizes.tolist() == [3, 2, 0])
+    assert(threads.thread('t1')['date'].is_monotonic_increasing)
+    assert(threads.thread('t1').index.tolist() == [2, 0, 5])
+    assert(threads.nunique('author').tolist() == [2, 1, 0])
+    assert([t for t, _ in threads] == ['t1', 't2'])
+
+
+def test_window_bounds():
+    months = window_bounds('2020-01-15', '2020-03-10', freq='MS',
+                           rollback=True, include_end=True)
+    assert([str(s.date()) for s, e in months] ==
+           ['2020-01-01', '2020-02-01', '2020-03-01'])
+    assert(months[-1][1] == pd.Timestamp('2020-04-01'))
+    sliding = window_bounds('2020-01-01', '2020-04-01', freq='MS',
+                            size='2MS')
+    assert(len(sliding) == 3)
+    assert(sliding[0] == (pd.Timestamp('2020-01-01'),
+                          pd.Timestamp('2020-03-01')))
+    assert(sliding[-1][1] == pd.Timestamp('2020-04-01'))
+
+
+def test_co_contributor_graph():
+    posts = pd.DataFrame.from_dict({
+        'topic': ['t1', 't1', 't1', 't2', 't2', 't2', 't3', None],
+        'author': ['a', 'b', 'a', 'b', 'c', '', 'a', 'd'],
+    })
+    contributors = pd.DataFrame.from_dict({
+        'id': ['a', 'b', 'c', 'd'], 'n': [1, 2, 3, 4]
+    }).set_index('id')
+    adjacency, nodes = co_contributor_adjacency(posts, 'author', 'topic')
+    assert(nodes.tolist() == ['a', 'b', 'c'])
+    assert(adjacency.toarray().tolist() == [[0, 1, 0], [1, 0, 1], [0, 1, 0]])
+    g = create_co_contributor_graph(posts, contributors, 'author', 'topic',
+                                    contributors.columns)
+    assert(sorted(g.edges(data='weight')) == [('a', 'b', 1), ('b', 'c', 1)])
+    assert(g.nodes['a'] == {'n': 1} and isinstance(g.nodes['a']['n'], int))
+    assert(graph_node_data(g, contributors).index.tolist() == ['a', 'b', 'c'])
+    g = create_co_contributor_graph(posts, contributors, 'author', 'topic',
+                                    None)
+    assert(g.nodes['a'] == {})
+
+    # many co-contributors and an empty contributor (without diagonal entry)
+    posts = pd.DataFrame.from_dict({
+        'topic': ['t1'] * 41,
+        'author': [''] + [f'a{i}' for i in range(40)],
+    })
+    adjacency, nodes = co_contributor_adjacency(posts, 'author', 'topic')
+    assert(len(nodes) == 40 and '' not in nodes)
+    assert(adjacency.diagonal().sum() == 0)
+    assert(adjacency.nnz == 40 * 39)
+
+
+def test_commenter_graph():
+    posts = pd.DataFrame.from_dict({
+        'topic': ['t1', 't1', 't1', 't2', 't2', 't1', None],
+        'author': ['a', 'b', 'b', 'c', 'a', 'a', 'b'],
+    })
+    contributors = pd.DataFrame.from_dict({
+        'id': ['a', 'b', 'c'], 'n': [1, 2, 3]
+    }).set_index('id')
+    g = create_commenter_graph(posts, contributors, 'author', 'topic',
+                               contributors.columns)
+    assert(sorted(g.edges(data='weight')) ==
+           [('a', 'a', 2), ('a', 'b', 2), ('c', 'a', 1), ('c', 'c', 1)])
+
+
+def _mask_slice(posts, col, start, end):
+    # the boolean-mask slicing that timeslice/date_range replaced
+    mask = posts[col].notna()
+    if start is not None:
+        mask &= posts[col] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= posts[col] < pd.Timestamp(end)
+    return posts[mask]
+
+
+def test_date_slicing():
+    dates = ['2020-01-03 10:00', '2020-01-01 10:00', '2020-01-02 10:00',
+             None, '2020-01-02 10:00', '2020-01-05 10:00', '2020-01-01 10:00']
+    c = PPCommunity('test', {
+        'posts': pd.DataFrame.from_dict({
+            'topic': ['t1', 't1', 't2', 't2', 't1', 't2', 't3'],
+            'author': ['a', 'b', 'c', 'a', 'b', 'c', 'a'],
+            'date': dates,
+            'text': ['x'] * len(dates)
+        }),
+        'users': pd.DataFrame.from_dict({'id': ['a', 'b', 'c']}),
+        'topics': pd.DataFrame.from_dict({'id': ['t1', 't2', 't3']})
+    })
+    posts = c.posts
+    unsorted = posts.sample(frac=1, random_state=0)
+    bounds = [None, '2019-12-31', '2020-01-01 10:00', '2020-01-01 12:00',
+              '2020-01-02 10:00', '2020-01-05 10:00', '2020-01-06']
+    for start in bounds:
+        for end in bounds:
+            expected = _mask_slice(posts, 'date', start, end)
+            for p in [posts, unsorted]:
+                result = c.timeslice(p, 'date', start, end)
+                if start is None and end is None:
+                    assert(result is p)
+                    continue
+                assert(sorted(result.index) == sorted(expected.index))
+            view = c.date_range(start, end)
+            assert(view.posts.index.tolist() == expected.index.tolist())
+            assert(set(view.topics.index) ==
+                   set(expected['topic'].dropna().unique()))
+    # views of views keep within the parent's window
+    view = c.date_range('2020-01-02 10:00', '2020-01-05 10:00')
+    for start in bounds:
+        for end in bounds:
+            sub = view.date_range(start, end).posts
+            expected = _mask_slice(
+                _mask_slice(posts, 'date', '2020-01-02 10:00',
+                            '2020-01-05 10:00'), 'date', start, end)
+            assert(sub.index.tolist() == expected.index.tolist())
+
+
 if __name__ == "__main__":
     test_where_all()
+    test_thread_structure()
+    test_thread_index()
+    test_window_bounds()
+    test_co_contributor_graph()
+    test_commenter_graph()
+    test_date_slicing()
     print("Everything passed")
\ No newline at end of file
@@ -1,9 +1,18 @@
-from networkx import in_degree_centrality, degree_centrality
+from networkx import in_degree_centrality, degree_centrality, \
+    out_degree_centrality, closeness_centrality, to_dict_of_dicts, \
+    gnm_random_graph
+import numpy as np
 
 from pici.pici import Pici
 from pici.communities.oem import OEMCommunityFactory
 from pici.communities.osm import OSMCommunityFactory
-from pici.communities.preciousplastic import PPCommunityFactory
+from pici.communities.preciousplastic import PPCommunity, \
+    PPCommunityFactory
+from pici.graphs import IGraph, SparseGraph, hoeffding_error, \
+    hoeffding_sample_size
+from pici.metrics.cached_metrics import thread_dates
+from pici.temporal import TemporalDegrees, lookup_snapshot_metric, \
+    snapshot_metrics
 import pandas as pd
 
 
@@ -15,10 +24,42 @@ pici = Pici(
     },
     start='2017-01-01',
     end='2019-01-01',
-    cache_nrows=3000
+    cache_nrows=3000,
+    lazy=True
 )
 
-c = pici.communities['OpenEnergyMonitor']
+
+def _community(name, seed, n_posts=800, n_authors=60, n_topics=120):
+    """
+    Random community of ``n_posts`` posts in two years (some by an empty
+    contributor), for tests that do not need scraped data.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2017-01-01') + pd.to_timedelta(
+        rng.integers(0, 2 * 365 * 24, n_posts), unit='h')
+    authors = [f'a{a}' for a in rng.integers(0, n_authors, n_posts)]
+    authors[::97] = [''] * len(authors[::97])
+    data = {
+        'posts': pd.DataFrame.from_dict({
+            'topic': [f't{t}' for t in rng.integers(0, n_topics, n_posts)],
+            'author': authors,
+            'date': dates.astype(str),
+            'text': ['x'] * n_posts
+        }),
+        'users': pd.DataFrame.from_dict({
+            'id': [f'a{a}' for a in range(n_authors)]}),
+        'topics': pd.DataFrame.from_dict({
+            'id': [f't{t}' for t in range(n_topics)]})
+    }
+    return PPCommunity(name, data)
+
+
+communities = {
+    'a': _community('a', 0, n_posts=1500, n_authors=150, n_topics=200),
+    'b': _community('b', 1, n_posts=500, n_authors=30, n_topics=40)
+}
+
+c = communities['a']
 
 
 def test_commenter_network():
@@ -35,10 +76,185 @@ def test_co_contributor_network():
         assert isinstance(dc, dict)
 
 
+def test_temporal_graph_cache():
+    c.invalidate_graphs()
+    cache = c.graph_cache
+    hits = cache.hits
+    date = c.posts[c.date_column].iloc[len(c.posts) // 2]
+    g = c.temporal_graph(end=date, kind='commenter')
+    assert c.temporal_graph(end=date, kind='commenter') is g
+    assert cache.hits == hits + 1
+    assert cache.nbytes > 0
+    c.invalidate_graphs('commenter')
+    assert len(cache) == 0
+
+
+def test_temporal_graphs():
+    dates = c.posts['rounded_date'].drop_duplicates().sort_values()[::10]
+    for kind in ['co_contributor', 'commenter']:
+        for date, g in c.temporal_graphs(dates, kind=kind):
+            full = c.temporal_graph(end=date, kind=kind)
+            assert set(g.nodes) == set(full.nodes)
+            assert to_dict_of_dicts(g) == to_dict_of_dicts(full)
+
+
+def test_temporal_degrees():
+    degrees = TemporalDegrees.from_community(c, 'commenter')
+    dates = c.posts['rounded_date'].drop_duplicates().sort_values()[::10]
+    for date in dates:
+        g = c.temporal_graph(end=date, kind='commenter')
+        nodes = list(g.nodes) + ['not a contributor']
+        for direction, centrality in [('in', in_degree_centrality(g)),
+                                      ('out', out_degree_centrality(g))]:
+            values = degrees.centrality(nodes, [date] * len(nodes),
+                                        direction=direction)
+            assert np.allclose(values[:-1], [centrality[n] for n in g.nodes])
+            assert np.isnan(values[-1])
+        weighted = degrees.degree(nodes[:-1], [date] * len(g),
+                                  weighted=True)
+        assert weighted.tolist() == [d for _, d in
+                                     g.in_degree(weight='weight')]
+
+
+def test_sparse_graph():
+    for cm in communities.values():
+        for m in ['co_contributor_degree', 'commenter_centralities',
+                  'co_contributor_centralities']:
+            a = getattr(cm.metrics, m)().data
+            b = getattr(cm.metrics, m)(backend='sparse').data
+            pd.testing.assert_frame_equal(a, b, check_dtype=False)
+        g = cm.sparse_graph('commenter')
+        assert g.number_of_edges() == cm.commenter_graph.number_of_edges()
+        closeness = closeness_centrality(cm.commenter_graph)
+        assert np.allclose(g.closeness_centrality().values,
+                           [closeness[n] for n in g.nodes])
+
+
+def test_igraph_backend():
+    for cm in communities.values():
+        for m in ['co_contributor_degree', 'commenter_centralities',
+                  'co_contributor_centralities',
+                  'initiator_centrality_in_co_contributor_network']:
+            a = getattr(cm.metrics, m)().data
+            b = getattr(cm.metrics, m)(backend='igraph').data
+            pd.testing.assert_frame_equal(a, b, check_dtype=False,
+                                          check_exact=False, atol=1e-4)
+        g = IGraph.from_networkx(cm.co_contributor_graph)
+        assert IGraph.from_networkx(cm.co_contributor_graph) is g
+        assert list(g.nodes) == list(cm.co_contributor_graph.nodes)
+
+
+def test_sampled_betweenness():
+    assert hoeffding_sample_size(10000, 0.05) < 10000
+    assert hoeffding_error(10000, hoeffding_sample_size(10000, 0.05)) <= 0.05
+    assert hoeffding_error(10000, None) == 0
+    column = 'initiator position: betweenness centrality in ' \
+             'co-contributor network (error bound)'
+    for cm in communities.values():
+        exact = cm.metrics.co_contributor_centralities().data
+        parallel = cm.metrics.co_contributor_centralities(backend='sparse',
+                                                          n_jobs=2).data
+        pd.testing.assert_frame_equal(exact, parallel, check_dtype=False)
+        for backend in ['networkx', 'sparse']:
+            sampled = cm.metrics.co_contributor_centralities(
+                backend=backend, epsilon=0.2, seed=1).data
+            bound = sampled['betweenness_centrality (error bound)']
+            assert (bound <= 0.2).all()
+            assert (((sampled['betweenness_centrality'] -
+                     exact['betweenness_centrality']).abs() <=
+                    bound + 1e-12).all())
+        for backend, kwargs in [('networkx', {'n_jobs': 2}),
+                                ('igraph', {'epsilon': 0.2})]:
+            try:
+                cm.metrics.co_contributor_centralities(backend=backend,
+                                                       **kwargs)
+                assert False
+            except ValueError:
+                pass
+
+        sampled = cm.metrics.initiator_centrality_in_co_contributor_network(
+            epsilon=0.5, seed=1).data
+        initial_posts = cm.posts[cm.posts['is_initial_post']].set_index(
+            cm.topic_column)
+        topic = sampled[column].idxmax()
+        n = len(cm.temporal_graph(
+            end=initial_posts.loc[topic, 'rounded_date']))
+        assert sampled.loc[topic, column] > 0
+        assert sampled.loc[topic, column] == \
+            hoeffding_error(n, hoeffding_sample_size(n, 0.5))
+
+    g = SparseGraph.from_networkx(gnm_random_graph(400, 2000, seed=1))
+    exact = g.betweenness_centrality()
+    k = hoeffding_sample_size(len(g), 0.2)
+    assert k < len(g)
+    sampled = g.betweenness_centrality(k=k, seed=1)
+    assert (sampled - exact).abs().max() <= hoeffding_error(len(g), k)
+    assert np.allclose(g.betweenness_centrality(k=k, seed=1, n_jobs=2),
+                       sampled)
+
+
+def test_snapshot_metrics():
+    dates = thread_dates(c)[::10]
+    tasks = [(kind, date, 'in_degree_centrality' if kind == 'commenter'
+              else 'betweenness_centrality')
+             for kind in ['co_contributor', 'commenter'] for date in dates]
+    table = snapshot_metrics(c, tasks)
+    pd.testing.assert_frame_equal(table, snapshot_metrics(c, tasks, n_jobs=2))
+    date = dates[len(dates) // 2]
+    centrality = in_degree_centrality(c.temporal_graph(end=date,
+                                                       kind='commenter'))
+    assert np.allclose(
+        lookup_snapshot_metric(table, ('commenter', 'in_degree_centrality'),
+                               [date] * len(centrality), list(centrality)),
+        list(centrality.values()))
+    assert np.isnan(lookup_snapshot_metric(
+        table, ('commenter', 'in_degree_centrality'), [date], ['-'])).all()
+    m = 'initiator_centrality_in_co_contributor_network'
+    pd.testing.assert_frame_equal(getattr(c.metrics, m)().data,
+                                  getattr(c.metrics, m)(n_jobs=2).data)
+
+
+def test_temporal_edges():
+    dates = list(thread_dates(c)[::10]) + [None]
+    for kind in ['co_contributor', 'commenter']:
+        edges = c.temporal_edges(kind)
+        assert c.temporal_edges(kind) is edges
+        for date in dates:
+            posts = c.posts.iloc[c._date_slice(c.posts, c.date_column, None,
+                                               date, include_start=False)]
+            g = c._create_graph(posts, kind)
+            h = c._generate_temporal_graph(end=date, kind=kind)
+            assert list(g.nodes(data=True)) == list(h.nodes(data=True))
+            assert list(g.edges(data=True)) == list(h.edges(data=True))
+            s = edges.to_sparse(date)
+            assert set(s.nodes) == set(g.nodes)
+            assert s.number_of_edges() == g.number_of_edges()
+        table = edges.table()
+        assert table['weight'].sum() == \
+            getattr(c, f'{kind}_graph').size(weight='weight')
+        assert (table['first_seen'] <= c.posts[c.date_column].max()).all()
+
+    degrees = TemporalDegrees.from_community(c, 'co_contributor')
+    date = thread_dates(c)[len(thread_dates(c)) // 2]
+    centrality = degree_centrality(c.temporal_graph(end=date))
+    assert np.allclose(degrees.centrality(list(centrality),
+                                          [date] * len(centrality)),
+                       list(centrality.values()))
+
+
 if __name__ == "__main__":
     pd.set_option('display.width', 80)
     # pd.set_option('expand_frame_repr', False)
     pd.set_option('display.max_columns', 999)
+    test_temporal_graph_cache()
+    test_temporal_graphs()
+    test_temporal_degrees()
+    test_sparse_graph()
+    test_igraph_backend()
+    test_sampled_betweenness()
+    test_snapshot_metrics()
+    test_temporal_edges()
+    # scraped communities (loaded from cache)
     test_commenter_network()
     test_co_contributor_network()
     print("Everything passed")
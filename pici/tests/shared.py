@@ -0,0 +1,31 @@
+import numpy as np
+
+from pici.shared import attach_community, _attached_segments
+from pici.communities.preciousplastic import PPCommunity
+from pici.tests.bundle import _community
+
+
+def test_shared_community():
+    c = _community()
+    with c.share() as shared:
+        s = attach_community(shared.handle)
+        assert isinstance(s, PPCommunity)
+        assert s == c
+        assert 'text' not in s.posts.columns
+        assert s.posts.equals(c.posts[s.posts.columns])
+        assert s.posts['author'].dtype == 'category'
+        buffer = np.frombuffer(
+            _attached_segments[shared.handle.tables['posts']['segment']].buf,
+            dtype=np.uint8)
+        assert np.shares_memory(s.posts['author'].cat.codes.values, buffer)
+        assert np.shares_memory(s.posts['date'].values, buffer)
+        assert set(s.co_contributor_graph.edges) == \
+            set(c.co_contributor_graph.edges)
+
+    with c.share(copy_objects=True) as shared:
+        assert attach_community(shared.handle).posts.equals(c.posts)
+
+
+if __name__ == "__main__":
+    test_shared_community()
+    print("Everything passed")